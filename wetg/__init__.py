@@ -2,9 +2,38 @@
 WETG v7 "Super Weox" - One File Telegram Bot Interpreter
 """
 
-from .interpreter import Wetg
-from .runner import run_file
+import importlib
 
 __version__ = "7.0.0"
 __author__ = "WETG"
-__all__ = ["Wetg", "run_file"]
\ No newline at end of file
+__all__ = [
+    "Wetg", "run_file", "StateStore", "MemoryStore", "SQLiteStore", "Outbox", "Metrics",
+    "Limits", "BudgetExceeded",
+]
+
+# name → submodule; imported on first access so `import wetg` (and the CLI)
+# stays cheap until a bot is actually built
+_EXPORTS = {
+    "Wetg": ".interpreter",
+    "run_file": ".runner",
+    "StateStore": ".state",
+    "MemoryStore": ".state",
+    "SQLiteStore": ".state",
+    "Outbox": ".outbox",
+    "Metrics": ".metrics",
+    "Limits": ".budget",
+    "BudgetExceeded": ".budget",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
@@ -1,16 +1,22 @@
 """
 WETG CLI — invoked via:
     python -m wetg run mybot.wetg
+    python -m wetg serve bots/*.wetg
     python -m wetg new mybot.wetg
     python -m wetg check mybot.wetg
+    python -m wetg bench mybot.wetg
+    python -m wetg replay mybot.wetg updates.jsonl
+    python -m wetg broadcast mybot.wetg --message "Hello everyone"
     wetg run mybot.wetg   (after pip install)
 """
 
 import sys
 import os
-import asyncio
+import json
 from . import __version__, __author__
-from .interpreter import Wetg
+
+# Commands import what they need themselves: `wetg check` and `wetg version`
+# must not load python-telegram-bot.
 
 VERSION_HEADER = "Super Weox"
 
@@ -64,17 +70,149 @@ def help_text():
     logo()
     print(f"{BOLD}Usage:{NC}")
     print("  wetg run <file.wetg>     Run a WETG bot")
+    print("  wetg serve <files...>    Run many bots in one process (e.g. bots/*.wetg)")
     print("  wetg new <file.wetg>     Create a bot from template")
-    print("  wetg check <file.wetg>   Validate a .wetg file")
+    print("  wetg check <files...>    Find mistakes in .wetg files (globs allowed)")
+    print("  wetg bench <file.wetg>   Benchmark a bot with synthetic updates (no token needed)")
+    print("  wetg replay <file.wetg> <updates.jsonl>")
+    print("                           Replay recorded updates against a fake Bot API")
+    print("  wetg broadcast <file.wetg> --message <text>")
+    print("                           Send a message to every user of the bot")
     print("  wetg version             Show version")
     print("  wetg help                Show this help")
     print()
+    print(f"{BOLD}Run options:{NC}")
+    print("  --state <file.db>        Persist user./chat. variables in SQLite")
+    print("  --concurrency <n>        Chats handled at the same time (default 16)")
+    print("  --workers <n>            Run the script in n processes, sharded by chat")
+    print("  --watch                  Reload the script when the file changes")
+    print("  --no-cache               Don't read or write the compiled <file>.wetgc")
+    print("  --media-cache <file>     Photo file_id cache (default <file>.media.json)")
+    print("  --webhook                Receive updates over HTTP instead of polling")
+    print("    --listen <addr>        Address to bind (default 0.0.0.0)")
+    print("    --port <n>             Port to bind (default 8443)")
+    print("    --path </hook>         URL path Telegram posts to (default /hook)")
+    print("    --url <https://...>    Public URL to register with Telegram")
+    print("    --secret <token>       Secret token Telegram must send")
+    print("    --cert/--key <file>    Serve HTTPS with this certificate")
+    print("  --metrics-port <n>       Serve Prometheus metrics on :n/metrics")
+    print("  --max-instructions <n>   Per-update budgets; 0 = unlimited (default 100000,")
+    print("  --max-loops <n>            10000 loop iterations, 100 sends, 50 nested calls")
+    print("  --max-sends <n>            and 60 seconds)")
+    print("  --max-depth <n>")
+    print("  --timeout <seconds>")
+    print("  --profile                Profile script lines; report on shutdown")
+    print("    --profile-out <file>   Collapsed stacks for flamegraphs (default <file>.folded)")
+    print()
+    print(f"{BOLD}Serve options:{NC}")
+    print("  --state-dir <dir>        One SQLite state file per bot in <dir>")
+    print("  --media-cache <file>     Shared photo file_id cache (default wetg.media.json)")
+    print("  --concurrency, --webhook options, --metrics-port and budgets as for run;")
+    print("  in webhook mode each bot is served on <path>/<name>")
+    print()
+    print(f"{BOLD}Check options:{NC}")
+    print("  --format <text|json|junit>  Report format (default text)")
+    print("  --output <file>          Write the json/junit report to a file")
+    print("  --jobs <n>               Processes for big batches (default: all cores)")
+    print("  Exits with 1 if any script has errors")
+    print()
+    print(f"{BOLD}Bench options:{NC}")
+    print("  --updates <n>            Measured updates (default 10000)")
+    print("  --users <n>              Distinct simulated users (default 100)")
+    print("  --mix <kind=w,...>       Traffic weights: command, usermsg, ask, callback")
+    print("  --texts <a,b,...>        usermsg texts (default: the script's guards)")
+    print("  --seed <n>               Random seed (default 0)")
+    print("  --profile                Print the slowest script lines afterwards")
+    print()
+    print(f"{BOLD}Replay options:{NC}")
+    print("  --speed <x>              1 = original timing, 2 = twice as fast (default: flat out)")
+    print("  --out <sends.jsonl>      Write the bot's replies")
+    print("  --expect <sends.jsonl>   Fail if the replies differ from an earlier --out")
+    print("  --username <name>        Bot @username for /cmd@bot routing")
+    print()
+    print(f"{BOLD}Broadcast options:{NC}")
+    print("  --state <file.db>        The bot's state file (default <file>.db)")
+    print("  --checkpoint <file>      Progress file to resume from (default <file>.broadcast.json)")
+    print("  --restart                Ignore the checkpoint and send to everyone again")
+    print("  --rate <n>               Messages per second (default 30; lower it while the bot runs)")
+    print("  --fake <n>               Dry run: n synthetic users on a fake Bot API (no token needed)")
+    print()
     print(f"{BOLD}Examples:{NC}")
     print("  wetg new mybot.wetg")
     print("  wetg run mybot.wetg")
     print()
 
-def cmd_run(filepath):
+RUN_FLAGS = ("webhook", "profile", "watch", "no_cache", "restart")
+
+def parse_options(args, flags=()):
+    """Split CLI args into positionals and a dict of --options.
+
+    `--key value` and `--key=value` set options; names in `flags` take no value.
+    """
+    positional = []
+    options = {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("--"):
+            key, eq, value = arg[2:].partition("=")
+            key = key.replace("-", "_")
+            if not eq:
+                if key in flags or i + 1 >= len(args):
+                    value = True
+                else:
+                    i += 1
+                    value = args[i]
+            options[key] = value
+        else:
+            positional.append(arg)
+        i += 1
+    return positional, options
+
+def server_options(options):
+    """start()/run() keyword arguments for the --webhook and --metrics-port options."""
+    run_options = {}
+    if options.get("webhook"):
+        run_options = {
+            "mode": "webhook",
+            "listen": options.get("listen", "0.0.0.0"),
+            "port": int(options.get("port", 8443)),
+            "path": options.get("path", "/hook"),
+            "url": options.get("url"),
+            "secret_token": options.get("secret"),
+        }
+        if options.get("cert"):
+            import ssl
+
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(options["cert"], options.get("key"))
+            run_options["ssl"] = context
+    if options.get("metrics_port"):
+        run_options["metrics_port"] = int(options["metrics_port"])
+        run_options.setdefault("listen", options.get("listen", "0.0.0.0"))
+    return run_options
+
+def limits_option(options):
+    """Limits from --max-* / --timeout, or None for the defaults."""
+    from .budget import Limits
+
+    names = {
+        "max_instructions": "instructions",
+        "max_loops": "loop_iterations",
+        "max_sends": "sends",
+        "max_depth": "depth",
+        "timeout": "seconds",
+    }
+    if not any(key in options for key in names):
+        return None
+    limits = Limits()
+    for key, field in names.items():
+        if key in options:
+            setattr(limits, field, float(options[key]) if field == "seconds" else int(options[key]))
+    return limits
+
+def cmd_run(filepath, options=None):
+    options = options or {}
     if not filepath:
         print(f"{RED}❌ No file specified. Usage: wetg run mybot.wetg{NC}")
         sys.exit(1)
@@ -82,16 +220,87 @@ def cmd_run(filepath):
         print(f"{RED}❌ File not found: {filepath}{NC}")
         sys.exit(1)
 
+    import asyncio
+    from .interpreter import Wetg
+    from .media import MediaCache
+    from .state import SQLiteStore
+
     print(f"{GREEN}🔥 WETG v{__version__} {VERSION_HEADER}{NC}")
 
     with open(filepath, "r", encoding="utf-8") as f:
         code = f.read()
 
-    bot = Wetg(code)
-    bot.parse()
+    media_path = options.get("media_cache") or os.path.splitext(filepath)[0] + ".media.json"
+    workers = int(options.get("workers", 1))
+    if workers > 1:
+        from .shard import ShardedWetg
+
+        state = options.get("state") or os.path.splitext(filepath)[0] + ".db"
+        print(f"🗄  Workers share user./chat. state through {state}")
+        bot = ShardedWetg(
+            code,
+            workers=workers,
+            state=state,
+            media_cache=media_path,
+            concurrency=int(options.get("concurrency", 16)),
+            limits=limits_option(options),
+        )
+    else:
+        store = SQLiteStore(options["state"]) if options.get("state") else None
+        bot = Wetg(
+            code,
+            store=store,
+            concurrency=int(options.get("concurrency", 16)),
+            media=MediaCache(media_path),
+            profile=bool(options.get("profile")),
+            limits=limits_option(options),
+        )
+    bot.parse(cache=None if options.get("no_cache") else os.path.splitext(filepath)[0] + ".wetgc")
+    if bot.cached:
+        print(f"⚡ Loaded compiled script from {os.path.splitext(filepath)[0]}.wetgc")
+
+    run_options = server_options(options)
+    if options.get("profile"):
+        run_options["profile_out"] = options.get("profile_out") or os.path.splitext(filepath)[0] + ".folded"
+    if options.get("watch"):
+        if workers > 1:
+            print(f"{YELLOW}⚠️  --watch is not supported with --workers; restart to apply changes{NC}")
+        else:
+            run_options["watch"] = filepath
 
     try:
-        asyncio.run(bot.run())
+        asyncio.run(bot.run(**run_options))
+    except RuntimeError as e:
+        print(f"{RED}❌ {e}{NC}")
+        sys.exit(1)
+
+def cmd_serve(patterns, options=None):
+    import asyncio
+    from .media import MediaCache
+    from .check import expand
+    from .serve import BotHost
+
+    options = options or {}
+    files = expand(patterns)
+    missing = [path for path in files if not os.path.exists(path)]
+    if not files or missing:
+        print(f"{RED}❌ {'File not found: ' + ', '.join(missing) if missing else 'No files specified.'}{NC}")
+        print("   Usage: wetg serve bots/*.wetg")
+        sys.exit(1)
+
+    print(f"{GREEN}🔥 WETG v{__version__} {VERSION_HEADER} — serving {len(files)} scripts{NC}")
+
+    host = BotHost(
+        files,
+        state_dir=options.get("state_dir"),
+        media=MediaCache(options.get("media_cache") or "wetg.media.json"),
+        concurrency=int(options.get("concurrency", 16)),
+        limits=limits_option(options),
+    )
+    host.load()
+
+    try:
+        asyncio.run(host.run(**server_options(options)))
     except RuntimeError as e:
         print(f"{RED}❌ {e}{NC}")
         sys.exit(1)
@@ -115,34 +324,220 @@ def cmd_new(filepath):
     print(f"   Edit it and add your bot token, then:")
     print(f"   {CYAN}wetg run {filepath}{NC}")
 
-def cmd_check(filepath):
+def cmd_check(patterns, options=None):
+    from .check import check_files, expand, to_json, to_junit
+
+    options = options or {}
+    paths = expand(patterns)
+    if not paths:
+        print(f"{RED}❌ No file specified. Usage: wetg check mybot.wetg [more.wetg bots/*.wetg]{NC}")
+        sys.exit(1)
+    fmt = options.get("format", "text")
+    if fmt not in ("text", "json", "junit"):
+        print(f"{RED}❌ Unknown format: {fmt} (use text, json or junit){NC}")
+        sys.exit(1)
+
+    reports = check_files(paths, jobs=int(options["jobs"]) if options.get("jobs") else None)
+    failed = [report for report in reports if not report.ok]
+
+    if fmt != "text":
+        output = to_json(reports) if fmt == "json" else to_junit(reports)
+        if options.get("output"):
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output)
+            print(f"📝 {len(reports)} checked, {len(failed)} with errors → {options['output']}")
+        else:
+            sys.stdout.write(output)
+        sys.exit(1 if failed else 0)
+
+    if len(reports) == 1:
+        report = reports[0]
+        print(f"{CYAN}🔍 Checking {report.path} ...{NC}")
+        token_status = '✅ Yes' if report.token else '❌ No — add: bot "TOKEN"'
+        print(f"  Token defined  : {token_status}")
+        print(f"  Commands       : {len(report.commands)} → {', '.join(report.commands) if report.commands else 'none'}")
+        print(f"  usermsg blocks : {report.usermsg}")
+        print(f"  Functions      : {len(report.functions)} → {', '.join(report.functions) if report.functions else 'none'}")
+        print(f"  Variables      : {len(report.variables)} → {', '.join(report.variables) if report.variables else 'none'}")
+        print(f"  Imports        : {', '.join(report.imports) if report.imports else 'none'}")
+        print()
+
+    for report in reports:
+        if len(reports) > 1:
+            mark = f"{GREEN}✅" if report.ok else f"{RED}❌"
+            print(f"{mark} {report.path}{NC}")
+        for issue in report.issues:
+            color = RED if issue.severity == "error" else YELLOW
+            print(f"  {color}{issue.format(report.path)}{NC}")
+
+    if failed:
+        print(f"\n{RED}❌ {len(failed)} of {len(reports)} scripts have errors{NC}")
+        sys.exit(1)
+    if len(reports) == 1:
+        report = reports[0]
+        if not report.token:
+            print(f"{YELLOW}⚠️  Add your bot token before running!{NC}")
+        else:
+            print(f"{GREEN}✅ Looks good! Run with: wetg run {report.path}{NC}")
+    else:
+        print(f"\n{GREEN}✅ {len(reports)} scripts checked, no errors{NC}")
+
+def cmd_bench(filepath, options=None):
+    from .bench import bench, bench_bot, parse_mix
+
+    options = options or {}
     if not filepath:
-        print(f"{RED}❌ No file specified.{NC}")
+        print(f"{RED}❌ No file specified. Usage: wetg bench mybot.wetg{NC}")
         sys.exit(1)
     if not os.path.exists(filepath):
         print(f"{RED}❌ File not found: {filepath}{NC}")
         sys.exit(1)
 
-    print(f"{CYAN}🔍 Checking {filepath} ...{NC}")
+    with open(filepath, "r", encoding="utf-8") as f:
+        code = f.read()
+
+    try:
+        mix = parse_mix(options["mix"]) if options.get("mix") else None
+        texts = options["texts"].split(",") if options.get("texts") else None
+        updates = int(options.get("updates", 10_000))
+        print(f"{CYAN}⏱  Benchmarking {filepath} with {updates} updates ...{NC}")
+        bot = bench_bot(code, profile=bool(options.get("profile")))
+        result = bench(
+            code,
+            bot=bot,
+            updates=updates,
+            users=int(options.get("users", 100)),
+            mix=mix,
+            texts=texts,
+            seed=int(options.get("seed", 0)),
+        )
+    except ValueError as e:
+        print(f"{RED}❌ {e}{NC}")
+        sys.exit(1)
+    print(result.report())
+    if bot.profiler is not None:
+        print(f"\n{BOLD}Slowest lines:{NC}")
+        print(bot.profiler.report())
+
+def cmd_replay(filepath, logpath, options=None):
+    from .replay import replay, read_updates, write_sends, compare_sends
+
+    options = options or {}
+    if not filepath or not logpath:
+        print(f"{RED}❌ Usage: wetg replay mybot.wetg updates.jsonl{NC}")
+        sys.exit(1)
+    for path in (filepath, logpath):
+        if not os.path.exists(path):
+            print(f"{RED}❌ File not found: {path}{NC}")
+            sys.exit(1)
 
     with open(filepath, "r", encoding="utf-8") as f:
         code = f.read()
+    updates = read_updates(logpath)
+
+    print(f"{CYAN}▶️  Replaying {len(updates)} updates from {logpath} ...{NC}")
+    result = replay(
+        code,
+        updates,
+        speed=float(options.get("speed", 0)),
+        username=options.get("username", "wetg_fake_bot"),
+        concurrency=int(options.get("concurrency", 16)),
+    )
+    print(result.report())
+
+    if options.get("out"):
+        write_sends(options["out"], result.sends)
+        print(f"{GREEN}✅ Wrote {len(result.sends)} replies to {options['out']}{NC}")
+    if options.get("expect"):
+        diff = compare_sends(result.sends, options["expect"])
+        if diff is not None:
+            i, want, got = diff
+            print(f"{RED}❌ Reply #{i + 1} differs from {options['expect']}{NC}")
+            print(f"   expected: {json.dumps(want, ensure_ascii=False)}")
+            print(f"   got     : {json.dumps(got, ensure_ascii=False)}")
+            sys.exit(1)
+        print(f"{GREEN}✅ Replies match {options['expect']}{NC}")
+
+def cmd_broadcast(filepath, options=None):
+    options = options or {}
+    text = options.get("message")
+    if not filepath or not isinstance(text, str) or not text:
+        print(f'{RED}❌ Usage: wetg broadcast mybot.wetg --message "Hello everyone"{NC}')
+        sys.exit(1)
+    if not os.path.exists(filepath):
+        print(f"{RED}❌ File not found: {filepath}{NC}")
+        sys.exit(1)
 
-    bot = Wetg(code)
-    bot.parse()
+    import asyncio
+    from .broadcast import BroadcastJob, fake_broadcast, message_key
 
-    token_ok = bool(bot.token)
-    print(f"  Token defined  : {'✅ Yes' if token_ok else '❌ No — add: bot \"TOKEN\"'}")
-    print(f"  Commands       : {len(bot.commands)} → {', '.join('/' + c.lstrip('/') for c in bot.commands) if bot.commands else 'none'}")
-    print(f"  usermsg blocks : {len(bot.usermsg_blocks)}")
-    print(f"  Functions      : {len(bot.functions)} → {', '.join(bot.functions) if bot.functions else 'none'}")
-    print(f"  Variables      : {len(bot.variables)} → {', '.join(bot.variables) if bot.variables else 'none'}")
-    print(f"  Imports        : {', '.join(bot.imports) if bot.imports else 'none'}")
+    base = os.path.splitext(filepath)[0]
+    checkpoint = options.get("checkpoint")
+    job_options = dict(
+        key=message_key(text),
+        page_size=int(options.get("page_size", 1000)),
+        window=int(options.get("window", 500)),
+    )
 
-    if not token_ok:
-        print(f"\n{YELLOW}⚠️  Add your bot token before running!{NC}")
-    else:
-        print(f"\n{GREEN}✅ Looks good! Run with: wetg run {filepath}{NC}")
+    if options.get("fake"):
+        users = int(options["fake"])
+        print(f"{CYAN}📣 Broadcasting to {users} synthetic users on a fake Bot API ...{NC}")
+        result, _ = asyncio.run(fake_broadcast(text, users, checkpoint=checkpoint, **job_options))
+        print(result.report())
+        return
+
+    from .interpreter import Wetg
+    from .outbox import Outbox
+    from .state import SQLiteStore
+
+    state = options.get("state") or base + ".db"
+    if not os.path.exists(state):
+        print(f"{RED}❌ No user list: {state} not found (run the bot with --state first){NC}")
+        sys.exit(1)
+    checkpoint = checkpoint or base + ".broadcast.json"
+    if options.get("restart") and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    with open(filepath, "r", encoding="utf-8") as f:
+        bot = Wetg(f.read())
+    bot.parse(cache=None if options.get("no_cache") else base + ".wetgc")
+    bot.load_token()
+    if not bot.token:
+        print(f"{RED}❌ Bot token not found in {filepath} or config.txt{NC}")
+        sys.exit(1)
+
+    async def run():
+        from telegram import Bot
+
+        store = SQLiteStore(state)
+        outbox = Outbox(global_rate=float(options.get("rate", 30)))
+        async with Bot(bot.token) as tg:
+            job = BroadcastJob(store, outbox, lambda user_id: tg.send_message(user_id, text),
+                               checkpoint=checkpoint, **job_options)
+
+            async def progress():
+                while True:
+                    await asyncio.sleep(10)
+                    r = job.result
+                    print(f"   … {r.total} users: {r.sent} sent, {r.failed} failed")
+
+            reporter = asyncio.create_task(progress())
+            try:
+                return await job.run()
+            finally:
+                reporter.cancel()
+                await outbox.stop()
+                await store.close()
+
+    print(f"{CYAN}📣 Broadcasting to the users in {state} (progress in {checkpoint}) ...{NC}")
+    try:
+        result = asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}⏸  Interrupted: run the same command again to resume{NC}")
+        sys.exit(1)
+    if result.already_sent:
+        print(f"{YELLOW}⚠️  This message was already broadcast (see {checkpoint}); use --restart to send it again{NC}")
+    print(result.report())
 
 def main():
     args = sys.argv[1:]
@@ -152,21 +547,30 @@ def main():
         return
 
     cmd = args[0]
-    arg2 = args[1] if len(args) > 1 else None
+    positional, options = parse_options(args[1:], flags=RUN_FLAGS)
+    arg2 = positional[0] if positional else None
 
     if cmd == "run":
-        cmd_run(arg2)
+        cmd_run(arg2, options)
+    elif cmd == "serve":
+        cmd_serve(positional, options)
     elif cmd == "new":
         cmd_new(arg2)
     elif cmd == "check":
-        cmd_check(arg2)
+        cmd_check(positional, options)
+    elif cmd == "bench":
+        cmd_bench(arg2, options)
+    elif cmd == "replay":
+        cmd_replay(arg2, positional[1] if len(positional) > 1 else None, options)
+    elif cmd == "broadcast":
+        cmd_broadcast(arg2, options)
     elif cmd in ("version", "--version", "-v"):
         print(f"WETG v{__version__} {VERSION_HEADER}")
     elif cmd in ("help", "--help", "-h"):
         help_text()
     elif cmd.endswith(".wetg"):
         # shortcut: wetg mybot.wetg
-        cmd_run(cmd)
+        cmd_run(cmd, options)
     else:
         print(f"{RED}❌ Unknown command: {cmd}{NC}")
         print("Run 'wetg help' for usage.")
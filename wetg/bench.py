@@ -0,0 +1,221 @@
+"""
+WETG v7 "Super Weox" — Headless benchmark
+
+Drives a parsed script with synthetic updates through the real update path
+(process_update → run_block → outbox) using the fake Bot from wetg.fake, so
+no token or network is needed. Flood limits run on a FakeClock and cost no
+wall time.
+
+    wetg bench mybot.wetg --updates 20000 --users 500
+
+    from wetg.bench import bench
+    result = bench(code, updates=20_000, users=500)
+    print(result.report())
+
+Traffic is a weighted mix of:
+
+    command    a random /command of the script
+    usermsg    a text: the literal guards of `on usermsg` blocks plus misses
+    ask        a /command whose block asks, followed by that user's answer
+    callback   a press of one of the script's `on button` callbacks
+"""
+
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from .compiler import OP_ASK, OP_IF
+from .fake import FakeBot, FakeContext, FakeUpdate
+from .interpreter import Wetg
+from .outbox import FakeClock, Outbox
+
+DEFAULT_MIX = {"command": 3, "usermsg": 5, "ask": 1, "callback": 1}
+
+# texts that (usually) match no guard, so the usermsg fallback path is measured too
+MISS_TEXTS = ("hello there", "what can you do?", "42", "ok")
+
+
+# ------------------ TRAFFIC ------------------
+
+def _has_ask(block):
+    return any(ins.op == OP_ASK for ins in block.code)
+
+
+def default_texts(bot: Wetg) -> list:
+    """Texts the script's usermsg guards match on, plus a few that match nothing."""
+    texts = []
+    for block in bot.usermsg_blocks:
+        index = block.code[0].index if block.code and block.code[0].op == OP_IF else None
+        if index is not None:
+            texts.extend(index.exact)
+    return texts + list(MISS_TEXTS)
+
+
+def parse_mix(spec: str) -> dict:
+    """"command=3,usermsg=5" → {"command": 3.0, "usermsg": 5.0}"""
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"unknown traffic kind: {kind} (use {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def traffic(bot: Wetg, fake: FakeBot, count: int, users: int = 100, mix: dict = None, texts=None, seed: int = 0):
+    """Yield `count` fake updates for the parsed `bot`, deterministically per seed."""
+    rng = random.Random(seed)
+    texts = list(texts) if texts else default_texts(bot)
+    commands = list(bot.commands)
+    asks = [cmd for cmd, block in bot.commands.items() if _has_ask(block)]
+    callbacks = list(bot.callbacks)
+    available = {"command": commands, "usermsg": texts, "ask": asks, "callback": callbacks}
+
+    mix = DEFAULT_MIX if mix is None else mix
+    kinds = [kind for kind, weight in mix.items() if weight > 0 and available[kind]]
+    if not kinds:
+        raise ValueError("nothing to send: the script has no commands, texts or callbacks for this mix")
+    weights = [mix[kind] for kind in kinds]
+
+    answering = set()   # users that were just asked something
+    for _ in range(count):
+        user_id = rng.randrange(1, users + 1)
+        if user_id in answering:
+            answering.discard(user_id)
+            yield FakeUpdate.text(fake, rng.choice(texts), user_id)
+            continue
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "callback":
+            yield FakeUpdate.callback(fake, rng.choice(callbacks), user_id)
+        elif kind == "usermsg":
+            yield FakeUpdate.text(fake, rng.choice(texts), user_id)
+        else:
+            if kind == "ask":
+                answering.add(user_id)
+            cmd = rng.choice(asks if kind == "ask" else commands)
+            yield FakeUpdate.text(fake, "/" + cmd.lstrip("/"), user_id)
+
+
+# ------------------ RESULTS ------------------
+
+def percentile(samples: list, q: float) -> float:
+    """q-th quantile (0..1) of already sorted samples."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class BenchResult:
+    """Numbers from one bench() run. Latencies are in seconds."""
+
+    def __init__(self, updates, seconds, latencies, sends, alloc_bytes, retained_blocks):
+        latencies = sorted(latencies)
+        self.updates = updates
+        self.seconds = seconds
+        self.rate = updates / seconds if seconds else 0.0
+        self.p50 = percentile(latencies, 0.50)
+        self.p95 = percentile(latencies, 0.95)
+        self.p99 = percentile(latencies, 0.99)
+        self.max = latencies[-1] if latencies else 0.0
+        self.sends = sends
+        self.alloc_bytes = alloc_bytes            # peak bytes allocated per update (None: not traced)
+        self.retained_blocks = retained_blocks    # net memory blocks kept per update
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def report(self) -> str:
+        ms = 1000
+        lines = [
+            f"  Updates        : {self.updates} in {self.seconds:.3f}s",
+            f"  Throughput     : {self.rate:,.0f} updates/s",
+            f"  Latency        : p50 {self.p50 * ms:.3f}ms  p95 {self.p95 * ms:.3f}ms  "
+            f"p99 {self.p99 * ms:.3f}ms  max {self.max * ms:.3f}ms",
+            f"  Sends          : {self.sends} ({self.sends / max(self.updates, 1):.2f}/update)",
+        ]
+        if self.alloc_bytes is not None:
+            lines.append(f"  Allocations    : {self.alloc_bytes / 1024:.1f} KiB/update (peak)")
+        lines.append(f"  Retained       : {self.retained_blocks:.2f} blocks/update")
+        return "\n".join(lines)
+
+
+# ------------------ RUNNER ------------------
+
+def bench_bot(code: str, **options) -> Wetg:
+    """Parse `code` into a Wetg whose outbox runs on virtual time."""
+    options.setdefault("outbox", Outbox(clock=FakeClock()))
+    bot = Wetg(code, **options)
+    bot.parse()
+    return bot
+
+
+async def bench_async(
+    code: str,
+    updates: int = 10_000,
+    users: int = 100,
+    mix: dict = None,
+    texts=None,
+    seed: int = 0,
+    warmup: int = 500,
+    trace: int = 1000,
+    bot: Wetg = None,
+) -> BenchResult:
+    """
+    Run `updates` synthetic updates one after another and time each of them.
+
+    `warmup` updates run first and are not measured (caches, lazy state);
+    then `trace` more run under tracemalloc to measure allocations (0 skips).
+    Pass a prepared `bot` to benchmark it instead of parsing `code`.
+    """
+    bot = bot or bench_bot(code)
+    fake = FakeBot(record=False)
+    context = FakeContext(fake)
+    process = bot.process_update
+    bot.outbox.start()
+    try:
+        stream = traffic(bot, fake, warmup + trace + updates, users, mix, texts, seed)
+
+        for _ in range(warmup):
+            await process(next(stream), context)
+
+        alloc = None
+        if trace:
+            peaks = 0
+            tracemalloc.start()
+            try:
+                for _ in range(trace):
+                    update = next(stream)
+                    tracemalloc.reset_peak()
+                    base = tracemalloc.get_traced_memory()[0]
+                    await process(update, context)
+                    peaks += tracemalloc.get_traced_memory()[1] - base
+            finally:
+                tracemalloc.stop()
+            alloc = peaks / trace
+
+        fake.clear()
+        if bot.profiler is not None:
+            bot.profiler.clear()
+        latencies = array("d", bytes(8 * updates))   # preallocated: keeps "retained" honest
+        clock = time.perf_counter
+        blocks = sys.getallocatedblocks()
+        start = clock()
+        for i, update in enumerate(stream):
+            t = clock()
+            await process(update, context)
+            latencies[i] = clock() - t
+        elapsed = clock() - start
+        retained = (sys.getallocatedblocks() - blocks) / max(updates, 1)
+    finally:
+        await bot.outbox.stop()
+
+    return BenchResult(updates, elapsed, latencies, fake.count, alloc, retained)
+
+
+def bench(code: str, **options) -> BenchResult:
+    """Blocking wrapper around bench_async()."""
+    return asyncio.run(bench_async(code, **options))
@@ -0,0 +1,267 @@
+"""
+WETG v7 "Super Weox" — Broadcasts
+
+A BroadcastJob sends one message to every known user (see StateStore.users)
+without holding them all in memory:
+
+    pages       user ids are read `page_size` at a time, in id order
+    window      at most `window` sends are queued in the Outbox at once, as
+                BULK so replies to live updates still go first
+    checkpoint  every `checkpoint_every` seconds the highest id below which
+                every send has finished is written to a small JSON file;
+                after a crash the job resumes from there (at most `window`
+                users can get the message twice)
+
+Failed sends are counted by reason. Users who blocked the bot, deleted their
+account or whose chat no longer exists are marked in the store and skipped by
+later broadcasts until they write again. The store is only used through its
+async methods, so a broadcast started by a running bot does no SQLite I/O on
+the bot's event loop.
+
+    job = BroadcastJob(store, outbox, lambda user_id: bot.send_message(user_id, "Hi all"))
+    result = await job.run()
+    print(result.report())
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import deque
+
+from .outbox import BULK
+
+# reasons a send can fail; the first three are permanent and marked in the store
+FAILURES = ("blocked", "deactivated", "not_found", "unreachable", "error")
+PERMANENT = ("blocked", "deactivated", "not_found")
+
+
+def classify(error) -> str:
+    """Failure reason for a Bot API error, from its type and message like
+    python-telegram-bot reports them (telegram.error is not imported)."""
+    names = {cls.__name__ for cls in type(error).__mro__}
+    text = str(error).lower()
+    if "Forbidden" in names:
+        if "blocked" in text:
+            return "blocked"
+        if "deactivated" in text:
+            return "deactivated"
+        return "unreachable"   # e.g. the user never started the bot
+    if "BadRequest" in names and "chat not found" in text:
+        return "not_found"
+    return "error"
+
+
+def message_key(text: str) -> str:
+    """Identifies a message in a checkpoint, so a resume never mixes two broadcasts."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class BroadcastResult:
+    """Progress of a BroadcastJob; final once run() returns."""
+
+    def __init__(self):
+        self.sent = 0
+        self.failures = dict.fromkeys(FAILURES, 0)
+        self.after = None       # every user up to this id is done
+        self.resumed_from = None
+        self.done = False
+        self.already_sent = False  # the checkpoint says this message went out before
+        self.seconds = 0.0      # wall time of this run
+        self.send_seconds = 0.0  # time on the Outbox clock (virtual with FakeClock)
+        self.rate = 0.0         # users per second of sending, this run
+
+    @property
+    def failed(self):
+        return sum(self.failures.values())
+
+    @property
+    def total(self):
+        return self.sent + self.failed
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+    def report(self) -> str:
+        lines = [
+            f"  Users          : {self.total}",
+            f"  Sent           : {self.sent}",
+            f"  Failed         : {self.failed} ("
+            + ", ".join(f"{name} {n}" for name, n in self.failures.items())
+            + ")",
+            f"  Throughput     : {self.rate:,.1f} messages/s over {self.send_seconds:,.1f}s "
+            f"of sending ({self.seconds:.3f}s wall)",
+        ]
+        if self.resumed_from is not None:
+            lines.append(f"  Resumed after  : user {self.resumed_from}")
+        if not self.done:
+            lines.append(f"  Stopped after  : user {self.after} (run again to resume)")
+        return "\n".join(lines)
+
+
+class BroadcastJob:
+    """
+    Fan one message out to every known user through the Outbox.
+
+    `send(user_id)` returns the coroutine that sends to one user. With
+    `checkpoint` (a file path) progress survives restarts; `key` (see
+    message_key()) must match for a checkpoint to be resumed.
+
+    Example:
+        job = BroadcastJob(store, outbox, send, checkpoint="bot.broadcast.json", key=message_key(text))
+        result = await job.run()
+    """
+
+    def __init__(
+        self,
+        store,
+        outbox,
+        send,
+        checkpoint: str = None,
+        key: str = "",
+        page_size: int = 1000,
+        window: int = 500,
+        checkpoint_every: float = 1.0,
+    ):
+        self.store = store
+        self.outbox = outbox
+        self.send = send
+        self.checkpoint = checkpoint
+        self.key = key
+        self.page_size = page_size
+        self.window = window
+        self.checkpoint_every = checkpoint_every
+        self.result = BroadcastResult()
+        self._saved_at = 0.0
+
+    # ------------------ CHECKPOINT ------------------
+
+    def _load(self):
+        if not self.checkpoint:
+            return None
+        try:
+            with open(self.checkpoint, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if data.get("key") == self.key else None
+
+    def _save(self):
+        result = self.result
+        data = {
+            "key": self.key,
+            "after": result.after,
+            "sent": result.sent,
+            "failures": result.failures,
+            "done": result.done,
+        }
+        tmp = f"{self.checkpoint}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.checkpoint)
+        self._saved_at = time.monotonic()
+
+    # ------------------ RUNNER ------------------
+
+    def _call(self, user_id):
+        return lambda: self.send(user_id)
+
+    async def _settle(self, inflight):
+        """Wait for the oldest queued send and record how it went."""
+        user_id, future = inflight[0]
+        result = self.result
+        try:
+            await future
+        except Exception as e:
+            reason = classify(e)
+            result.failures[reason] += 1
+            if reason in PERMANENT:
+                await self.store.write_user_status(user_id, reason)
+        else:
+            result.sent += 1
+        inflight.popleft()
+        result.after = user_id
+        if self.checkpoint and time.monotonic() - self._saved_at >= self.checkpoint_every:
+            self._save()
+
+    async def run(self) -> BroadcastResult:
+        """Send to every user after the checkpoint; returns the totals."""
+        result = self.result
+        saved = self._load()
+        if saved is not None:
+            result.after = result.resumed_from = saved["after"]
+            result.sent = saved["sent"]
+            result.failures.update(saved["failures"])
+            if saved["done"]:
+                result.done = result.already_sent = True
+                return result
+
+        self.outbox.start()
+        started = time.perf_counter()
+        clock_started = self.outbox.clock.now()
+        total_before = result.total
+        inflight = deque()   # (user id, future) in id order
+        try:
+            after = result.after
+            while True:
+                page = await self.store.load_users(after, self.page_size)
+                if not page:
+                    break
+                for user_id in page:
+                    while len(inflight) >= self.window:
+                        await self._settle(inflight)
+                    inflight.append((user_id, self.outbox.submit(user_id, self._call(user_id), BULK)))
+                after = page[-1]
+            while inflight:
+                await self._settle(inflight)
+            result.done = True
+        finally:
+            # stopped early: drop what is still queued, it is sent on resume
+            for _, future in inflight:
+                future.cancel()
+            result.seconds = time.perf_counter() - started
+            result.send_seconds = self.outbox.clock.now() - clock_started
+            if result.send_seconds:
+                result.rate = (result.total - total_before) / result.send_seconds
+            if self.checkpoint:
+                self._save()
+        return result
+
+
+# ------------------ FAKE RUN ------------------
+
+def fake_users(store, users: int):
+    """Add user ids 1..users to `store`; returns the FakeBot `unreachable` map
+    (every 50th user blocked the bot, every 199th deleted their account,
+    every 997th chat is gone)."""
+    unreachable = {}
+    for user_id in range(1, users + 1):
+        store.remember_user(user_id)
+        if user_id % 997 == 0:
+            unreachable[user_id] = "not_found"
+        elif user_id % 199 == 0:
+            unreachable[user_id] = "deactivated"
+        elif user_id % 50 == 0:
+            unreachable[user_id] = "blocked"
+    return unreachable
+
+
+async def fake_broadcast(text: str, users: int = 100_000, store=None, **options):
+    """Broadcast `text` to `users` synthetic users on a FakeBot, with the
+    Outbox on virtual time. Returns (BroadcastResult, FakeBot).
+
+    Example:
+        result, bot = asyncio.run(fake_broadcast("Hello", users=100_000))
+    """
+    from .fake import FakeBot
+    from .outbox import FakeClock, Outbox
+    from .state import MemoryStore
+
+    store = store or MemoryStore()
+    bot = FakeBot(record=False, unreachable=fake_users(store, users))
+    outbox = Outbox(clock=FakeClock())
+    job = BroadcastJob(store, outbox, lambda user_id: bot.send_message(user_id, text), **options)
+    try:
+        return await job.run(), bot
+    finally:
+        await outbox.stop()
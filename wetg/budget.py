@@ -0,0 +1,193 @@
+"""
+WETG v7 "Super Weox" — Execution budgets
+
+One update may not monopolise the bot. While it is handled (all the blocks
+and functions it runs together) the interpreter enforces:
+
+    instructions    executed instructions                      default 100 000
+    loop_iterations iterations of all `loop`s, charged when a
+                    loop starts so `loop {n} times` with a huge
+                    n fails before doing anything               default 10 000
+    sends           messages and photos sent                    default 100
+    depth           nested `call`s (a function calling itself)   default 50
+    seconds         wall-clock time, including Bot API calls but
+                    not waiting in the Outbox for a flood-limit
+                    slot                                         default 60
+
+Time in the Outbox queue is excluded because Telegram's limits (1 message/s
+per chat, 20/min per group) would otherwise cut long but legitimate handlers
+off well before `sends`. Scripts that send more than `sends` messages for one
+update (e.g. `loop 200 times` + `send`) stop at the limit now; raise it or
+pass limits=False for them.
+
+A value of 0 (or None) means unlimited. The clock is checked between
+instructions and, for handlers waiting on Telegram, by one Watchdog task per
+bot. When a budget runs out the handler
+stops where it is, the user gets one "⚠️ Stopped" message and
+wetg_budget_exceeded_total{bot, handler, limit} is incremented.
+
+    bot = Wetg(code, limits=Limits(sends=10, seconds=5))
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+
+_budget = ContextVar("wetg_budget", default=None)
+
+_UNLIMITED = float("inf")
+
+
+class BudgetExceeded(Exception):
+    """Raised inside a handler that used up one of its budgets; `limit` names which."""
+
+    def __init__(self, limit, message, handler=None):
+        super().__init__(message)
+        self.limit = limit
+        self.handler = handler
+
+
+class Limits:
+    """Per-update budgets; 0 or None disables one."""
+
+    __slots__ = ("instructions", "loop_iterations", "sends", "depth", "seconds")
+
+    def __init__(self, instructions=100_000, loop_iterations=10_000, sends=100, depth=50, seconds=60.0):
+        self.instructions = instructions
+        self.loop_iterations = loop_iterations
+        self.sends = sends
+        self.depth = depth
+        self.seconds = seconds
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"Limits({fields})"
+
+
+class Budget:
+    """What is left of the Limits for the update being handled."""
+
+    __slots__ = (
+        "limits", "instructions", "loop_iterations", "sends", "depth", "deadline", "handler", "_remaining",
+    )
+
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        self.instructions = limits.instructions or _UNLIMITED
+        self.loop_iterations = limits.loop_iterations or _UNLIMITED
+        self.sends = limits.sends or _UNLIMITED
+        self.depth = limits.depth or _UNLIMITED
+        self.deadline = time.monotonic() + limits.seconds if limits.seconds else _UNLIMITED
+        self.handler = None   # the block being run, for the metric
+        self._remaining = None  # seconds left while the clock is paused
+
+    def exceeded(self, limit):
+        if limit == "seconds":
+            raise BudgetExceeded(limit, f"took longer than {self.limits.seconds:g}s", self.handler)
+        names = {
+            "instructions": "instructions",
+            "loop_iterations": "loop iterations",
+            "sends": "messages",
+            "depth": "nested calls",
+        }
+        raise BudgetExceeded(limit, f"more than {getattr(self.limits, limit)} {names[limit]}", self.handler)
+
+    def loop(self, times):
+        self.loop_iterations -= times
+        if self.loop_iterations < 0:
+            self.exceeded("loop_iterations")
+        self.check_time()
+
+    def enter(self):
+        self.depth -= 1
+        if self.depth < 0:
+            self.exceeded("depth")
+
+    def leave(self):
+        self.depth += 1
+
+    def send(self):
+        self.sends -= 1
+        if self.sends < 0:
+            self.exceeded("sends")
+
+    def pause(self):
+        """Stop the clock (while queued behind flood limits)."""
+        if self._remaining is None:
+            self._remaining = self.deadline - time.monotonic()
+            self.deadline = _UNLIMITED
+
+    def resume(self):
+        if self._remaining is not None:
+            self.deadline = time.monotonic() + self._remaining
+            self._remaining = None
+
+    def check_time(self):
+        if time.monotonic() > self.deadline:
+            self.exceeded("seconds")
+
+
+def current() -> Budget:
+    """The budget of the update handled by the running task, if any."""
+    return _budget.get()
+
+
+class Watchdog:
+    """
+    Cancels handlers that run past their deadline.
+
+    One timer for all updates instead of one per update: the check runs
+    every `interval` seconds while handlers are active, so a handler is
+    stopped at most `interval` after its deadline.
+    """
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.running = {}   # task → Budget
+        self.timed_out = set()
+        self._task = None
+
+    def add(self, task, budget):
+        self.running[task] = budget
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    def discard(self, task):
+        self.running.pop(task, None)
+        self.timed_out.discard(task)
+
+    async def _loop(self):
+        while self.running:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            for task, budget in list(self.running.items()):
+                if now > budget.deadline and task not in self.timed_out:
+                    self.timed_out.add(task)
+                    task.cancel()
+
+
+async def run_limited(limits: Limits, run, watchdog: Watchdog = None):
+    """Await `run()` under a fresh Budget.
+
+    BudgetExceeded (including the wall-clock timeout) propagates to the
+    caller. Without a `watchdog` the time limit is only checked between
+    instructions, not while waiting on Telegram.
+    """
+    budget = Budget(limits)
+    token = _budget.set(budget)
+    task = asyncio.current_task() if watchdog is not None and limits.seconds else None
+    if task is not None:
+        watchdog.add(task, budget)
+    try:
+        await run()
+    except asyncio.CancelledError:
+        if task is None or task not in watchdog.timed_out:
+            raise
+        # our own timeout, not a shutdown: swallow the cancellation
+        if hasattr(task, "uncancel"):
+            task.uncancel()
+        budget.exceeded("seconds")
+    finally:
+        _budget.reset(token)
+        if task is not None:
+            watchdog.discard(task)
@@ -0,0 +1,80 @@
+"""
+WETG v7 "Super Weox" — Compiled script cache
+
+`wetg run mybot.wetg` stores the result of parsing next to the script as
+mybot.wetgc: the compiled blocks (instructions, condition code objects,
+template segments), the dispatch indexes and the script's settings. The next
+start loads that file instead of parsing again, as long as
+
+    the source is byte-for-byte the same (sha256), and
+    it was written by the same WETG version on the same Python version.
+
+Anything else (missing, stale or unreadable cache) falls back to a normal
+parse, which rewrites the cache. Like the script itself, a .wetgc file runs
+code when loaded: only use caches you wrote.
+"""
+
+import copyreg
+import hashlib
+import importlib.util
+import io
+import marshal
+import os
+import pickle
+import types
+
+MAGIC = b"WETGC3\n"   # 2: `broadcast`, 3: "auto" button kind
+
+
+def engine() -> str:
+    """Identifies the compiler and bytecode format a cache was written with."""
+    from . import __version__
+
+    return f"{__version__}/{importlib.util.MAGIC_NUMBER.hex()}"
+
+
+def source_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def _reduce_code(code):
+    # code objects are not picklable; marshal is what .pyc files use
+    return marshal.loads, (marshal.dumps(code),)
+
+
+class _Pickler(pickle.Pickler):
+    dispatch_table = copyreg.dispatch_table.copy()
+    dispatch_table[types.CodeType] = _reduce_code
+
+
+def save(path: str, code: str, state: dict):
+    """Write `state` (what Wetg.parse() produced for `code`) to `path`."""
+    buf = io.BytesIO()
+    buf.write(MAGIC)
+    pickle.dump((engine(), source_hash(code)), buf)
+    _Pickler(buf, pickle.HIGHEST_PROTOCOL).dump(state)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(buf.getvalue())
+        os.replace(tmp, path)   # readers never see half a file
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load(path: str, code: str):
+    """The state saved for `code`, or None if the cache is missing or stale."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            # the small header is checked before the blocks are unpickled
+            if pickle.load(f) != (engine(), source_hash(code)):
+                return None
+            return pickle.load(f)
+    except Exception:
+        return None
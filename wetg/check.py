@@ -0,0 +1,355 @@
+"""
+WETG v7 "Super Weox" — Static checks
+
+`wetg check` reads scripts the way the compiler does and reports, with line
+numbers, what the interpreter would silently ignore or misread:
+
+    error     the line cannot work: a condition or placeholder that does not
+              compile, `else` / `stop` without their `if` / `loop`, a call to
+              an undefined function, a malformed `button =`, an unknown
+              statement or `send ... with` kind, a module that can't be found,
+              button data over Telegram's 64 bytes
+    warning   probably a mistake: `loop` without `stop`, an orphan `elif`
+              (runs as a plain `if`), `with button` without a button, a
+              button nobody handles, a handler defined twice, no token
+
+    wetg check bots/*.wetg --format junit --output check.xml
+
+Big batches are spread over a process pool. Nothing here imports the
+interpreter or python-telegram-bot.
+"""
+
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from .compiler import Field, Template, compile_condition, compile_template, parse_button, parse_loop_count
+from .lazy import module_exists
+
+SEND_KINDS = ("markdown", "html", "image", "button")
+
+# Telegram's limit for callback_data
+CALLBACK_DATA_MAX = 64
+
+# below this many files a pool costs more than it saves
+POOL_MIN_FILES = 8
+
+
+def expand(patterns) -> list:
+    """Script paths from file names and glob patterns, without duplicates."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+class Issue:
+    """One finding: source line (0 for the whole file), severity and message."""
+
+    __slots__ = ("line", "severity", "message")
+
+    def __init__(self, line, severity, message):
+        self.line = line
+        self.severity = severity
+        self.message = message
+
+    def as_dict(self):
+        return {"line": self.line, "severity": self.severity, "message": self.message}
+
+    def format(self, path):
+        return f"{path}:{self.line}: {self.severity}: {self.message}"
+
+
+class Report:
+    """Everything `wetg check` found in one script."""
+
+    def __init__(self, path):
+        self.path = path
+        self.issues = []
+        self.token = False
+        self.commands = []
+        self.usermsg = 0
+        self.functions = []
+        self.variables = []
+        self.imports = []
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.issues.append(Issue(line, "error", message))
+
+    def warning(self, line, message):
+        self.issues.append(Issue(line, "warning", message))
+
+    @property
+    def errors(self):
+        return [i for i in self.issues if i.severity == "error"]
+
+    @property
+    def warnings(self):
+        return [i for i in self.issues if i.severity == "warning"]
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def as_dict(self):
+        return {
+            "path": self.path,
+            "ok": self.ok,
+            "errors": len(self.errors),
+            "warnings": len(self.warnings),
+            "token": self.token,
+            "commands": self.commands,
+            "usermsg": self.usermsg,
+            "functions": self.functions,
+            "variables": self.variables,
+            "imports": self.imports,
+            "issues": [i.as_dict() for i in self.issues],
+        }
+
+
+# ------------------ ANALYSIS ------------------
+
+def _check_template(report, lineno, text):
+    template = compile_template(text)
+    if type(template) is not Template:
+        return
+    for part in template.parts:
+        if type(part) is Field and part.name is None and part.expr is None:
+            report.error(lineno, f"placeholder {part.raw} does not compile: it is sent as-is")
+
+
+def _check_block(report, lines, calls, buttons):
+    """Mirror compile_block(): same chain and loop rules, but report what it drops."""
+    chains = []   # [indent, has_else] of open if-chains
+    loops = []    # line numbers of loops without their stop yet
+    button = None
+
+    for lineno, indent, line in lines:
+        is_elif = line.startswith("elif ")
+        is_else = not is_elif and line.startswith("else")
+
+        while chains and chains[-1][0] >= indent:
+            if chains[-1][0] == indent and (is_elif or is_else) and not chains[-1][1]:
+                break
+            chains.pop()
+
+        if line.startswith("send ") and " with " in line:
+            text, kind = line.split(" with ", 1)
+            kind = kind.strip()
+            _check_template(report, lineno, text[5:].strip().strip('"'))
+            if kind not in SEND_KINDS:
+                report.error(lineno, f"unknown send kind '{kind}' (use {', '.join(SEND_KINDS)}): nothing is sent")
+            elif kind == "button" and button is None:
+                report.warning(lineno, "`with button` but no `button =` line before it: sent without buttons")
+
+        elif line.startswith("send "):
+            _check_template(report, lineno, line[5:].strip().strip('"'))
+
+        elif line.startswith("ask "):
+            _check_template(report, lineno, line[4:].strip().strip('"'))
+
+        elif line.startswith("broadcast "):
+            _check_template(report, lineno, line[10:].strip().strip('"'))
+
+        elif line.startswith("if ") or is_elif:
+            cond = line[3:] if not is_elif else line[5:]
+            if compile_condition(cond.strip()) is None:
+                report.error(lineno, f"condition does not compile: {cond.strip()} (always false)")
+            if is_elif and chains and chains[-1][0] == indent:
+                continue
+            if is_elif:
+                report.warning(lineno, "elif without a matching if: runs as a plain if")
+            chains.append([indent, False])
+
+        elif is_else:
+            if chains and chains[-1][0] == indent:
+                chains[-1][1] = True
+            else:
+                report.error(lineno, "else without a matching if: ignored")
+
+        elif line.startswith("loop "):
+            if parse_loop_count(line) == 0:
+                report.warning(lineno, "loop with a count of 0 never runs")
+            loops.append(lineno)
+
+        elif line == "stop":
+            if loops:
+                loops.pop()
+            else:
+                report.error(lineno, "stop without a loop: ignored")
+
+        elif line.startswith("set "):
+            if "=" not in line:
+                report.error(lineno, "set without '=': ignored")
+            else:
+                _check_template(report, lineno, line.split("=", 1)[1].strip())
+
+        elif line.startswith("call "):
+            calls.append((lineno, line[5:].strip()))
+
+        elif line.startswith("button ="):
+            button = parse_button(line)
+            if button is None:
+                report.error(lineno, 'malformed button line: use button = ["Label", "data or url"], ... | ...')
+            else:
+                for row in button.rows:
+                    for label, kind, value in row:
+                        if kind == "callback" and type(value) is str:
+                            buttons.append((lineno, value))
+                            if len(value.encode("utf-8")) > CALLBACK_DATA_MAX:
+                                report.error(
+                                    lineno,
+                                    f"button data '{value}' is longer than {CALLBACK_DATA_MAX} bytes: Telegram rejects it",
+                                )
+
+        else:
+            report.error(lineno, f"unknown statement: {line.split()[0]}")
+
+    for lineno in loops:
+        report.warning(lineno, "loop without stop: repeats everything to the end of the block")
+
+
+def check_source(code: str, path: str = "<script>") -> Report:
+    """Statically check one script."""
+    started = time.perf_counter()
+    report = Report(path)
+    sections = []     # (line of the header, lines)
+    handlers = {}     # on-name → line
+    callbacks = set()
+    current = None
+
+    for lineno, line in enumerate(code.splitlines(), 1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip())
+
+        if stripped.lower().startswith("wetg "):
+            # version header, e.g. WETG "Super Weox"
+            continue
+        if stripped.startswith("import "):
+            for m in stripped[7:].split(","):
+                m = m.strip()
+                if not module_exists(m):
+                    report.error(lineno, f"module not found: {m or '(empty)'}")
+                elif m not in report.imports:
+                    report.imports.append(m)
+            continue
+        if stripped.startswith("bot "):
+            if stripped.count('"') < 2:
+                report.error(lineno, 'bot line needs a quoted token: bot "TOKEN"')
+            else:
+                report.token = True
+            continue
+        if stripped.startswith("function "):
+            name = stripped[9:].strip()
+            if name in report.functions:
+                report.warning(lineno, f"function {name} is defined twice: the last one wins")
+            else:
+                report.functions.append(name)
+            current = []
+            sections.append(current)
+            continue
+        if stripped.startswith("set ") and indent == 0:
+            if "=" not in stripped:
+                report.error(lineno, "set without '=': ignored")
+            else:
+                report.variables.append(stripped[4:].split("=", 1)[0].strip())
+            continue
+        if stripped.startswith("on "):
+            name = stripped[3:].strip()
+            if name == "usermsg":
+                report.usermsg += 1
+            elif name in handlers:
+                report.warning(lineno, f"`on {name}` is defined twice (line {handlers[name]}): the last one wins")
+            else:
+                handlers[name] = lineno
+                if name.startswith("button "):
+                    callbacks.add(name[7:].strip())
+                else:
+                    report.commands.append("/" + name.lstrip("/"))
+            current = []
+            sections.append(current)
+            continue
+
+        if current is None:
+            report.warning(lineno, "outside of any `on` / `function` block: ignored")
+            continue
+        current.append((lineno, indent, stripped))
+
+    calls = []
+    buttons = []
+    for lines in sections:
+        _check_block(report, lines, calls, buttons)
+
+    for lineno, name in calls:
+        if name not in report.functions:
+            report.error(lineno, f"call to undefined function {name}: ignored")
+    for lineno, data in buttons:
+        if data not in callbacks:
+            report.warning(lineno, f"button data '{data}' has no `on button {data}` handler")
+    if not report.token:
+        report.warning(0, 'no bot token: add bot "TOKEN" or put TOKEN= in config.txt')
+
+    report.issues.sort(key=lambda issue: issue.line)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def check_file(path: str) -> Report:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        report = Report(path)
+        report.error(0, f"cannot read file: {e}")
+        return report
+    return check_source(code, path)
+
+
+def check_files(paths, jobs: int = None) -> list:
+    """Reports for `paths`, in order; big batches run on `jobs` processes."""
+    paths = list(paths)
+    if jobs == 1 or len(paths) < POOL_MIN_FILES:
+        return [check_file(path) for path in paths]
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(check_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+
+# ------------------ OUTPUT ------------------
+
+def to_json(reports) -> str:
+    return json.dumps([report.as_dict() for report in reports], ensure_ascii=False, indent=2)
+
+
+def to_junit(reports) -> str:
+    """One <testcase> per script; errors fail it, warnings go to system-out."""
+    failures = sum(1 for report in reports if not report.ok)
+    total = sum(report.seconds for report in reports)
+    out = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<testsuite name="wetg check" tests="{len(reports)}" failures="{failures}" errors="0" time="{total:.3f}">',
+    ]
+    for report in reports:
+        out.append(
+            f'  <testcase classname="wetg.check" name={quoteattr(report.path)} time="{report.seconds:.3f}">'
+        )
+        errors = report.errors
+        if errors:
+            text = "\n".join(issue.format(report.path) for issue in errors)
+            out.append(f'    <failure type="error" message={quoteattr(errors[0].message)}>{escape(text)}</failure>')
+        warnings = report.warnings
+        if warnings:
+            text = "\n".join(issue.format(report.path) for issue in warnings)
+            out.append(f"    <system-out>{escape(text)}</system-out>")
+        out.append("  </testcase>")
+    out.append("</testsuite>")
+    return "\n".join(out) + "\n"
@@ -0,0 +1,530 @@
+"""
+WETG v7 "Super Weox" — Block compiler
+
+Turns the (lineno, indent, text) lines collected by Wetg.parse() into a flat
+list of typed instructions with precomputed jump targets, so the runtime never
+has to look at source strings again.
+"""
+
+import re
+from functools import lru_cache
+from string import Formatter
+
+
+# ------------------ OPCODES ------------------
+
+OP_SEND = 1
+OP_SEND_WITH = 2
+OP_ASK = 3
+OP_IF = 4
+OP_JUMP = 5
+OP_LOOP = 6
+OP_STOP = 7
+OP_SET = 8
+OP_CALL = 9
+OP_BROADCAST = 10
+
+
+# ------------------ INSTRUCTIONS ------------------
+
+class Instruction:
+    """Base class for compiled WETG instructions."""
+
+    __slots__ = ()
+    op = 0
+
+    def __repr__(self):
+        names = [n for cls in reversed(type(self).__mro__) for n in getattr(cls, "__slots__", ())]
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in names)
+        return f"{type(self).__name__}({fields})"
+
+
+class Send(Instruction):
+    """send "text" """
+
+    __slots__ = ("text",)
+    op = OP_SEND
+
+    def __init__(self, text):
+        self.text = compile_template(text)
+
+
+class SendWith(Instruction):
+    """send "text" with markdown|html|image|button (`button` is the Keyboard in effect)"""
+
+    __slots__ = ("text", "kind", "button")
+    op = OP_SEND_WITH
+
+    def __init__(self, text, kind, button=None):
+        self.text = compile_template(text)
+        self.kind = kind
+        self.button = button
+
+
+class Ask(Instruction):
+    """ask "question" — replies and ends the block."""
+
+    __slots__ = ("text",)
+    op = OP_ASK
+
+    def __init__(self, text):
+        self.text = compile_template(text)
+
+
+class If(Instruction):
+    """if <cond> — jumps to `target` when the condition is false.
+
+    `cond` is the compiled code object (None if the source does not compile).
+    `index` is a DispatchIndex when this is the head of a usermsg guard chain.
+    """
+
+    __slots__ = ("source", "cond", "target", "index")
+    op = OP_IF
+
+    def __init__(self, source, target=None):
+        self.source = source
+        self.cond = compile_condition(source)
+        self.target = target
+        self.index = None
+
+
+class Elif(If):
+    """elif <cond> — only reached through the false target of the previous branch."""
+
+    __slots__ = ()
+
+
+class Jump(Instruction):
+    """Unconditional jump, emitted at the end of a taken if/elif branch."""
+
+    __slots__ = ("target",)
+    op = OP_JUMP
+
+    def __init__(self, target=None):
+        self.target = target
+
+
+class Else(Jump):
+    """else — falling into it means a previous branch ran, so skip to the chain end."""
+
+    __slots__ = ()
+
+
+class Loop(Instruction):
+    """loop N times / loop var — `end` points just past the matching stop."""
+
+    __slots__ = ("count", "end")
+    op = OP_LOOP
+
+    def __init__(self, count, end=None):
+        self.count = count
+        self.end = end
+
+
+class Stop(Instruction):
+    """stop — jumps back into the loop body while iterations remain."""
+
+    __slots__ = ("start",)
+    op = OP_STOP
+
+    def __init__(self, start):
+        self.start = start
+
+
+class Set(Instruction):
+    """set key=value (inside a block).
+
+    `set user.key=…` / `set chat.key=…` have `target` "user" / "chat" and
+    write to that namespace of the state store instead of the bot globals.
+    """
+
+    __slots__ = ("target", "key", "value")
+    op = OP_SET
+
+    def __init__(self, key, value):
+        self.target = None
+        if key.startswith(("user.", "chat.")):
+            self.target, key = key.split(".", 1)
+        self.key = key
+        self.value = compile_template(value)
+
+
+class Call(Instruction):
+    """call function_name"""
+
+    __slots__ = ("name",)
+    op = OP_CALL
+
+    def __init__(self, name):
+        self.name = name
+
+
+class Broadcast(Instruction):
+    """broadcast "text" — sends to every known user, in the background."""
+
+    __slots__ = ("text",)
+    op = OP_BROADCAST
+
+    def __init__(self, text):
+        self.text = compile_template(text)
+
+
+# ------------------ EXPRESSIONS ------------------
+
+# Globals handed to eval(): no builtins, everything else comes from the scope.
+EVAL_GLOBALS = {"__builtins__": {}}
+
+_PLACEHOLDER = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|\{([A-Za-z_][A-Za-z0-9_.]*)\}"
+)
+
+
+def _unbrace(match):
+    return match.group(1) or f"({match.group(2)})"
+
+
+def normalize_condition(source):
+    """Turn `{usermsg} == "hi"` into `(usermsg) == "hi"` (string literals untouched)."""
+    return _PLACEHOLDER.sub(_unbrace, source)
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(source):
+    """Compile an eval() expression once; returns None if it does not compile."""
+    try:
+        return compile(source, "<wetg>", "eval")
+    except (SyntaxError, ValueError):
+        return None
+
+
+def compile_condition(source):
+    """Compile an if/elif condition with its {placeholders} bound as variables."""
+    return compile_expression(normalize_condition(source))
+
+
+# ------------------ TEMPLATES ------------------
+
+_PATH = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+_CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+_MISSING = object()
+
+
+class Field:
+    """One `{...}` placeholder of a template.
+
+    Simple names and dotted paths (`user.name`) are resolved by lookup and
+    getattr; anything else (`random.randint(1, 6)`) is a compiled expression.
+    If resolving fails the placeholder is emitted unchanged.
+    """
+
+    __slots__ = ("name", "attrs", "expr", "conversion", "spec", "raw")
+
+    def __init__(self, field, conversion, spec):
+        self.raw = "{" + field + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}"
+        self.conversion = _CONVERSIONS.get(conversion) if conversion else None
+        self.spec = spec or ""
+        if _PATH.match(field):
+            self.name, *attrs = field.split(".")
+            self.attrs = tuple(attrs)
+            self.expr = None
+        else:
+            self.name = None
+            self.attrs = ()
+            self.expr = compile_expression(field)
+
+    def render(self, scope):
+        try:
+            if self.expr is not None:
+                value = eval(self.expr, EVAL_GLOBALS, scope)
+            else:
+                value = scope.get(self.name, _MISSING)
+                if value is _MISSING:
+                    return self.raw
+                for attr in self.attrs:
+                    value = getattr(value, attr)
+            if self.conversion is not None:
+                value = self.conversion(value)
+            return format(value, self.spec)
+        except Exception:
+            return self.raw
+
+
+class Template:
+    """A pre-split interpolated string: literal segments and Fields."""
+
+    __slots__ = ("source", "parts")
+
+    def __init__(self, source, parts):
+        self.source = source
+        self.parts = parts
+
+    def render(self, scope):
+        return "".join([p if type(p) is str else p.render(scope) for p in self.parts])
+
+    def __repr__(self):
+        return f"Template({self.source!r})"
+
+
+def compile_template(source):
+    """Compile `"Hi {user.name}"` into a Template, or a plain str if it has no fields."""
+    try:
+        parsed = list(Formatter().parse(source))
+    except ValueError:
+        return source  # str.format would have failed too: sent as-is
+    parts = []
+    for literal, field, spec, conversion in parsed:
+        if literal:
+            parts.append(literal)
+        if field is None:
+            continue
+        if not field or field.isdigit():
+            # positional fields have nothing to bind to
+            return source
+        parts.append(Field(field, conversion, spec))
+    if all(type(p) is str for p in parts):
+        return "".join(parts)
+    return Template(source, parts)
+
+
+def render(text, scope):
+    """Render a compiled template (a str is returned as-is)."""
+    return text if type(text) is str else text.render(scope)
+
+
+# ------------------ BLOCK ------------------
+
+class Block:
+    """A compiled `on` / `function` body: instructions plus their source line numbers."""
+
+    __slots__ = ("name", "code", "lines")
+
+    def __init__(self, name, code, lines):
+        self.name = name
+        self.code = code
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.code)
+
+    def __iter__(self):
+        return iter(self.code)
+
+    def __repr__(self):
+        return f"<Block {self.name} ({len(self.code)} instructions)>"
+
+
+# ------------------ COMPILER ------------------
+
+class _Chain:
+    """An open if/elif/else chain while its body lines are being compiled."""
+
+    __slots__ = ("indent", "false_pc", "ends", "has_else")
+
+    def __init__(self, indent, false_pc):
+        self.indent = indent
+        self.false_pc = false_pc
+        self.ends = []
+        self.has_else = False
+
+
+def _close_chain(chain, code):
+    end = len(code)
+    if chain.false_pc is not None:
+        code[chain.false_pc].target = end
+    for pc in chain.ends:
+        code[pc].target = end
+
+
+# ------------------ KEYBOARDS ------------------
+
+_BUTTON = re.compile(r"\[([^\]]*)\]")
+_URL_SCHEMES = ("http://", "https://", "tg://")
+
+
+class Keyboard:
+    """An inline keyboard resolved at compile time.
+
+    `rows` holds (label, kind, value) per button, kind being "url",
+    "callback" or "auto" (a templated value such as "{site}": url or
+    callback depending on what it renders to, see button_kind()); label and
+    value are compiled templates. A keyboard without placeholders is
+    `static`: its markup is built once and reused.
+    """
+
+    __slots__ = ("rows", "static", "markup")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.static = all(
+            type(label) is str and type(value) is str
+            for row in rows for label, _, value in row
+        )
+        self.markup = None
+
+    def __repr__(self):
+        return f"Keyboard({self.rows!r})"
+
+
+def button_kind(value: str) -> str:
+    """"url" for links, else "callback"."""
+    return "url" if value.startswith(_URL_SCHEMES) else "callback"
+
+
+def parse_button(text):
+    """Parse a `button = ...` line into a Keyboard, or None if it is malformed.
+
+        button = ["Site", "https://example.com"]
+        button = ["Yes", "yes"], ["No", "no"]          one row, two callback buttons
+        button = ["A", "https://a"] | ["B", "https://b"]  two rows
+    """
+    spec = text.split("=", 1)[1].strip() if "=" in text else ""
+    if not spec or _BUTTON.sub("", spec).replace(",", "").replace("|", "").strip():
+        return None
+    rows = []
+    for row_spec in spec.split("|"):
+        row = []
+        for inner in _BUTTON.findall(row_spec):
+            if "," not in inner:
+                return None
+            label, value = (part.strip().strip('"').strip() for part in inner.split(",", 1))
+            if not label or not value:
+                return None
+            compiled = compile_template(value)
+            kind = button_kind(value)
+            if kind == "callback" and type(compiled) is not str:
+                kind = "auto"
+            row.append((compile_template(label), kind, compiled))
+        if not row:
+            return None
+        rows.append(tuple(row))
+    return Keyboard(tuple(rows))
+
+
+def parse_loop_count(text):
+    """`loop 5 times` → 5, `loop n` → "n" (looked up at runtime)."""
+    parts = text[5:].split()
+    if not parts:
+        return 0
+    token = parts[0].strip("{}")
+    if token.lstrip("-").isdigit():
+        return int(token)
+    return token
+
+
+def compile_block(name, lines):
+    """Compile a list of (lineno, indent, text) source lines into a Block."""
+    code = []
+    linenos = []
+    chains = []
+    loops = []
+    button = None
+
+    def emit(ins, lineno):
+        code.append(ins)
+        linenos.append(lineno)
+        return len(code) - 1
+
+    for lineno, indent, line in lines:
+        is_elif = line.startswith("elif ")
+        is_else = not is_elif and line.startswith("else")
+
+        # close every chain whose body ended at this line
+        while chains and chains[-1].indent >= indent:
+            chain = chains[-1]
+            if chain.indent == indent and (is_elif or is_else) and not chain.has_else:
+                break
+            _close_chain(chain, code)
+            chains.pop()
+
+        # --- send ... with ... ---
+        if line.startswith("send ") and " with " in line:
+            text, kind = line.split(" with ", 1)
+            text = text[5:].strip().strip('"')
+            emit(SendWith(text, kind.strip(), button), lineno)
+
+        # --- send ---
+        elif line.startswith("send "):
+            emit(Send(line[5:].strip().strip('"')), lineno)
+
+        # --- ask ---
+        elif line.startswith("ask "):
+            emit(Ask(line[4:].strip().strip('"')), lineno)
+
+        # --- if ---
+        elif line.startswith("if "):
+            pc = emit(If(line[3:].strip()), lineno)
+            chains.append(_Chain(indent, pc))
+
+        # --- elif ---
+        elif is_elif:
+            cond = line[5:].strip()
+            if chains and chains[-1].indent == indent:
+                chain = chains[-1]
+                chain.ends.append(emit(Jump(), lineno))
+                code[chain.false_pc].target = len(code)
+                chain.false_pc = emit(Elif(cond), lineno)
+            else:
+                # orphan elif: behaves like a plain if
+                pc = emit(If(cond), lineno)
+                chains.append(_Chain(indent, pc))
+
+        # --- else ---
+        elif is_else:
+            if chains and chains[-1].indent == indent:
+                chain = chains[-1]
+                chain.ends.append(emit(Else(), lineno))
+                code[chain.false_pc].target = len(code)
+                chain.false_pc = None
+                chain.has_else = True
+
+        # --- loop ---
+        elif line.startswith("loop "):
+            loops.append(emit(Loop(parse_loop_count(line)), lineno))
+
+        # --- stop ---
+        elif line == "stop":
+            if loops:
+                start = loops.pop()
+                emit(Stop(start), lineno)
+                code[start].end = len(code)
+
+        # --- runtime set ---
+        elif line.startswith("set "):
+            if "=" in line:
+                key, val = line[4:].split("=", 1)
+                emit(Set(key.strip(), val.strip()), lineno)
+
+        # --- call function ---
+        elif line.startswith("call "):
+            emit(Call(line[5:].strip()), lineno)
+
+        # --- broadcast ---
+        elif line.startswith("broadcast "):
+            emit(Broadcast(line[10:].strip().strip('"')), lineno)
+
+        # --- button definition (used by the next `send ... with button`) ---
+        elif line.startswith("button ="):
+            button = parse_button(line)
+
+    while chains:
+        _close_chain(chains.pop(), code)
+    for start in loops:
+        code[start].end = len(code)
+
+    return Block(name, code, linenos)
+
+
+def static_media(blocks):
+    """Local file paths of every `send "..." with image` whose path has no placeholders."""
+    paths = []
+    for block in blocks:
+        for ins in block.code:
+            if (
+                ins.op == OP_SEND_WITH
+                and ins.kind == "image"
+                and type(ins.text) is str
+                and not ins.text.startswith("http")
+                and ins.text not in paths
+            ):
+                paths.append(ins.text)
+    return paths
@@ -0,0 +1,109 @@
+"""
+WETG v7 "Super Weox" — Pending `ask` conversations
+
+When a block runs `ask`, the interpreter parks a continuation (the block and
+the instruction after the ask) here, keyed by (chat id, user id). Entries
+expire after `ttl` seconds, the table never holds more than `max_size`
+entries (least recently asked are evicted first) and a background sweeper
+drops expired entries of users who never answered.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class Pending:
+    """A parked continuation: resume `block` at `pc` with the saved loop counters."""
+
+    __slots__ = ("block", "pc", "loops", "expires")
+
+    def __init__(self, block, pc, loops, expires):
+        self.block = block
+        self.pc = pc
+        self.loops = loops
+        self.expires = expires
+
+
+class ConversationTable:
+    """Bounded, TTL-expiring map of (chat id, user id) → Pending."""
+
+    def __init__(self, ttl: float = 3600, max_size: int = 100_000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._task = None
+        self.answered = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def put(self, key, block, pc, loops=None):
+        """Remember that `key` owes an answer to the ask at block[pc - 1]."""
+        entries = self._entries
+        entries.pop(key, None)
+        entries[key] = Pending(block, pc, dict(loops) if loops else {}, self.clock() + self.ttl)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def pop(self, key):
+        """Take the pending continuation for `key`, or None if absent / expired."""
+        pending = self._entries.pop(key, None)
+        if pending is None:
+            return None
+        if pending.expires <= self.clock():
+            self.expired += 1
+            return None
+        self.answered += 1
+        return pending
+
+    def __contains__(self, key):
+        pending = self._entries.get(key)
+        return pending is not None and pending.expires > self.clock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def sweep(self):
+        """Drop expired entries. Every entry shares one TTL, so they expire in insertion order."""
+        now = self.clock()
+        entries = self._entries
+        removed = 0
+        while entries:
+            key, pending = next(iter(entries.items()))
+            if pending.expires > now:
+                break
+            del entries[key]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "live": len(self._entries),
+            "answered": self.answered,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    # ------------------ SWEEPER ------------------
+
+    async def _sweeper(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def start(self, interval: float = 60):
+        """Start the background sweeper on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweeper(interval))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,249 @@
+"""
+WETG v7 "Super Weox" — usermsg dispatch index
+
+Most `on usermsg` blocks start with a ladder of literal guards:
+
+    if {usermsg} == "hi"            → exact match
+    elif {usermsg} in ("a", "b")    → exact match, several keys
+    elif {usermsg}.startswith("/")  → prefix
+    elif re.match("\\d+", {usermsg}) → regex (only when the script imports re)
+
+index_block() turns such a head chain into a DispatchIndex (hash + prefix
+trie + precompiled regexes), so an incoming text jumps straight to the body
+of the first matching branch. A guard that can't be indexed stops the index:
+texts that match nothing before it fall back to normal evaluation from there.
+
+UsermsgIndex does the same across blocks, so blocks that are nothing but an
+unmatched guard chain are not run at all.
+"""
+
+import ast
+import re
+
+from .compiler import If, Elif, normalize_condition
+
+_TERMINAL = ""
+
+
+# ------------------ GUARDS ------------------
+
+def _is_usermsg(node):
+    return isinstance(node, ast.Name) and node.id == "usermsg"
+
+
+def _is_str(node):
+    return isinstance(node, ast.Constant) and type(node.value) is str
+
+
+def _strings(node):
+    """A str constant or a tuple/list/set of them → list of str, else None."""
+    if _is_str(node):
+        return [node.value]
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)) and all(_is_str(e) for e in node.elts):
+        return [e.value for e in node.elts]
+    return None
+
+
+def parse_guard(source: str, regex: bool = False):
+    """Classify a condition as ("exact" | "prefix" | "regex", keys), or None."""
+    try:
+        node = ast.parse(normalize_condition(source), mode="eval").body
+    except SyntaxError:
+        return None
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1:
+        left, op, right = node.left, node.ops[0], node.comparators[0]
+        if isinstance(op, ast.Eq):
+            if _is_usermsg(left) and _is_str(right):
+                return "exact", [right.value]
+            if _is_usermsg(right) and _is_str(left):
+                return "exact", [left.value]
+        elif isinstance(op, ast.In) and _is_usermsg(left) and not _is_str(right):
+            keys = _strings(right)
+            if keys is not None:
+                return "exact", keys
+
+    elif isinstance(node, ast.Call) and not node.keywords and isinstance(node.func, ast.Attribute):
+        func = node.func
+        if func.attr == "startswith" and _is_usermsg(func.value) and len(node.args) == 1:
+            keys = _strings(node.args[0])
+            if keys is not None:
+                return "prefix", keys
+        elif (
+            regex
+            and func.attr in ("match", "fullmatch", "search")
+            and isinstance(func.value, ast.Name) and func.value.id == "re"
+            and len(node.args) == 2
+            and _is_str(node.args[0]) and _is_usermsg(node.args[1])
+        ):
+            try:
+                return "regex", [getattr(re.compile(node.args[0].value), func.attr)]
+            except re.error:
+                return None
+
+    return None
+
+
+# ------------------ INDEX ------------------
+
+class _Trie:
+    """Prefix trie: matches(text) yields the values of every prefix of text."""
+
+    __slots__ = ("root",)
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, prefix, value):
+        node = self.root
+        for ch in prefix:
+            node = node.setdefault(ch, {})
+        node.setdefault(_TERMINAL, []).append(value)
+
+    def matches(self, text):
+        node = self.root
+        values = node.get(_TERMINAL)
+        if values:
+            yield from values
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                return
+            values = node.get(_TERMINAL)
+            if values:
+                yield from values
+
+    def __bool__(self):
+        return bool(self.root)
+
+
+class DispatchIndex:
+    """Jump table for a chain of literal guards on {usermsg}.
+
+    Branches are numbered in source order; the first matching one wins.
+    """
+
+    __slots__ = ("exact", "prefixes", "regexes", "bodies", "fallback", "default")
+
+    def __init__(self, bodies, fallback, default):
+        self.exact = {}
+        self.prefixes = _Trie()
+        self.regexes = []
+        self.bodies = bodies        # branch number → pc of its body
+        self.fallback = fallback    # pc of the first unindexable condition, or None
+        self.default = default      # pc when nothing matches (else body / chain end)
+
+    def add(self, branch, kind, keys):
+        if kind == "exact":
+            for key in keys:
+                self.exact.setdefault(key, branch)
+        elif kind == "prefix":
+            for key in keys:
+                self.prefixes.add(key, branch)
+        else:
+            self.regexes.extend((branch, match) for match in keys)
+
+    def branch(self, text):
+        """Number of the first matching branch, or None."""
+        best = self.exact.get(text)
+        if self.prefixes:
+            for branch in self.prefixes.matches(text):
+                if best is None or branch < best:
+                    best = branch
+        for branch, match in self.regexes:
+            if best is not None and branch >= best:
+                break
+            if match(text):
+                best = branch
+                break
+        return best
+
+    def lookup(self, text):
+        """pc to continue at for this text, or None to evaluate the chain normally."""
+        if type(text) is not str:
+            return None
+        best = self.branch(text)
+        if best is not None:
+            return self.bodies[best]
+        return self.fallback if self.fallback is not None else self.default
+
+
+def index_block(block, regex: bool = False):
+    """Attach a DispatchIndex to the if-chain at the head of `block`, if it has one."""
+    code = block.code
+    if not code or type(code[0]) is not If:
+        return None
+
+    index = None
+    pc = 0
+    branch = 0
+    while True:
+        guard = parse_guard(code[pc].source, regex)
+        if guard is None:
+            if index is None:
+                return None
+            index.fallback = pc
+            break
+        if index is None:
+            index = DispatchIndex([], None, None)
+        index.add(branch, *guard)
+        index.bodies.append(pc + 1)
+        branch += 1
+        target = code[pc].target
+        if target < len(code) and type(code[target]) is Elif:
+            pc = target
+            continue
+        index.default = target
+        break
+
+    code[0].index = index
+    return index
+
+
+class UsermsgIndex:
+    """Selects which usermsg blocks can react to a text.
+
+    A block whose whole body is one fully indexed guard chain without else
+    only runs when one of its guards matches; every other block always runs.
+    """
+
+    def __init__(self, blocks):
+        self.size = len(blocks)
+        self.always = []
+        self.exact = {}
+        self.prefixes = _Trie()
+        self.regexes = []
+        for n, block in enumerate(blocks):
+            index = block.code[0].index if block.code and type(block.code[0]) is If else None
+            if index is None or index.fallback is not None or index.default != len(block.code):
+                self.always.append(n)
+                continue
+            for key in index.exact:
+                self.exact.setdefault(key, []).append(n)
+            for prefix, _ in _walk(index.prefixes.root, ""):
+                self.prefixes.add(prefix, n)
+            for _, match in index.regexes:
+                self.regexes.append((n, match))
+
+    def select(self, text):
+        """Block numbers (in source order) to run for this text."""
+        if type(text) is not str:
+            return range(self.size)
+        if len(self.always) == self.size:
+            return self.always
+        selected = set(self.always)
+        selected.update(self.exact.get(text, ()))
+        selected.update(self.prefixes.matches(text))
+        for n, match in self.regexes:
+            if n not in selected and match(text):
+                selected.add(n)
+        return sorted(selected)
+
+
+def _walk(node, prefix):
+    """Yield (prefix, values) for every terminal of a trie."""
+    if _TERMINAL in node:
+        yield prefix, node[_TERMINAL]
+    for ch, child in node.items():
+        if ch != _TERMINAL:
+            yield from _walk(child, prefix + ch)
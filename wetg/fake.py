@@ -0,0 +1,213 @@
+"""
+WETG v7 "Super Weox" — Fake Telegram objects
+
+Just enough of telegram.Update / Bot for the interpreter to run a script
+without a token or network: replies are recorded on the FakeBot instead of
+being sent. Used by `wetg bench`, `wetg replay` and `wetg broadcast --fake`.
+
+    bot = FakeBot()
+    update = FakeUpdate.text(bot, "/start", user_id=42)
+    await wetg.process_update(update, FakeContext(bot))
+    bot.sent   # [(update id, "reply_text", 42, ("👋 Hi User42!",), {}), ...]
+"""
+
+import itertools
+
+_update_ids = itertools.count(1)
+_file_ids = itertools.count(1)
+
+
+class FakeUser:
+    __slots__ = ("id", "first_name", "username", "is_bot")
+
+    def __init__(self, id, first_name=None, username=None):
+        self.id = id
+        self.first_name = first_name or f"User{id}"
+        self.username = username
+        self.is_bot = False
+
+
+class FakeChat:
+    __slots__ = ("id", "type", "title")
+
+    def __init__(self, id, type="private", title=None):
+        self.id = id
+        self.type = type
+        self.title = title
+
+
+class FakePhotoSize:
+    __slots__ = ("file_id",)
+
+    def __init__(self, file_id):
+        self.file_id = file_id
+
+
+class FakeMessage:
+    """A message; reply_*() calls are recorded on the bot."""
+
+    __slots__ = ("bot", "message_id", "chat", "from_user", "text", "photo", "update_id")
+
+    def __init__(self, bot, chat, from_user=None, text=None, photo=()):
+        self.bot = bot
+        self.message_id = next(bot.message_ids)
+        self.chat = chat
+        self.from_user = from_user
+        self.text = text
+        self.photo = list(photo)
+        self.update_id = None   # of the update that carried this message
+
+    @property
+    def chat_id(self):
+        return self.chat.id
+
+    async def reply_text(self, text, **kwargs):
+        self.bot.record(self.update_id, "reply_text", self.chat.id, (text,), kwargs)
+        return FakeMessage(self.bot, self.chat, text=text)
+
+    async def reply_photo(self, photo, **kwargs):
+        self.bot.record(self.update_id, "reply_photo", self.chat.id, (photo,), kwargs)
+        file_id = photo if isinstance(photo, str) and not photo.startswith("http") else f"fake-{next(_file_ids)}"
+        return FakeMessage(self.bot, self.chat, photo=[FakePhotoSize(file_id)])
+
+
+class FakeCallbackQuery:
+    __slots__ = ("id", "from_user", "message", "data", "answered")
+
+    def __init__(self, from_user, message, data):
+        self.id = str(next(_update_ids))
+        self.from_user = from_user
+        self.message = message
+        self.data = data
+        self.answered = False
+
+    async def answer(self, *args, **kwargs):
+        self.answered = True
+
+
+class FakeUpdate:
+    """
+    Example:
+        update = FakeUpdate.text(bot, "hello", user_id=7)
+        update = FakeUpdate.callback(bot, "yes", user_id=7)
+    """
+
+    __slots__ = ("update_id", "message", "callback_query", "effective_user", "effective_chat")
+
+    def __init__(self, update_id=None, message=None, callback_query=None):
+        self.update_id = next(_update_ids) if update_id is None else update_id
+        self.message = message
+        self.callback_query = callback_query
+        source = message if message is not None else callback_query.message if callback_query else None
+        self.effective_user = (
+            message.from_user if message is not None
+            else callback_query.from_user if callback_query is not None
+            else None
+        )
+        self.effective_chat = source.chat if source is not None else None
+        if source is not None:
+            source.update_id = self.update_id
+
+    @property
+    def effective_message(self):
+        if self.message is not None:
+            return self.message
+        return self.callback_query.message if self.callback_query is not None else None
+
+    @classmethod
+    def text(cls, bot, text, user_id=1, chat_id=None, first_name=None, username=None, update_id=None):
+        """A text message from `user_id` (in their private chat unless `chat_id` is given)."""
+        user = FakeUser(user_id, first_name, username)
+        chat = FakeChat(user_id) if chat_id is None else FakeChat(chat_id, "private" if chat_id > 0 else "group")
+        return cls(update_id, message=FakeMessage(bot, chat, user, text))
+
+    @classmethod
+    def callback(cls, bot, data, user_id=1, chat_id=None, first_name=None, username=None, update_id=None):
+        """A press of an inline button carrying `data`."""
+        user = FakeUser(user_id, first_name, username)
+        chat = FakeChat(user_id) if chat_id is None else FakeChat(chat_id, "private" if chat_id > 0 else "group")
+        query = FakeCallbackQuery(user, FakeMessage(bot, chat), data)
+        return cls(update_id, callback_query=query)
+
+    @classmethod
+    def from_dict(cls, bot, data):
+        """Build from a Telegram update dict (as received by getUpdates or a webhook)."""
+        def user(d):
+            return FakeUser(d["id"], d.get("first_name"), d.get("username")) if d else None
+
+        def chat(d):
+            return FakeChat(d["id"], d.get("type", "private"), d.get("title"))
+
+        if "callback_query" in data:
+            q = data["callback_query"]
+            m = q.get("message") or {}
+            from_user = user(q.get("from"))
+            message = FakeMessage(bot, chat(m.get("chat") or {"id": from_user.id}))
+            return cls(data.get("update_id"), callback_query=FakeCallbackQuery(from_user, message, q.get("data")))
+        m = data.get("message")
+        if m is None:
+            return cls(data.get("update_id"))
+        message = FakeMessage(bot, chat(m["chat"]), user(m.get("from")), m.get("text"))
+        return cls(data.get("update_id"), message=message)
+
+
+class Forbidden(Exception):
+    """Same name and messages as telegram.error.Forbidden."""
+
+
+class BadRequest(Exception):
+    """Same name and messages as telegram.error.BadRequest."""
+
+
+# what Telegram answers when a message can't be delivered
+UNREACHABLE = {
+    "blocked": (Forbidden, "Forbidden: bot was blocked by the user"),
+    "deactivated": (Forbidden, "Forbidden: user is deactivated"),
+    "unreachable": (Forbidden, "Forbidden: bot can't initiate conversation with a user"),
+    "not_found": (BadRequest, "Chat not found"),
+}
+
+
+class FakeBot:
+    """
+    Stands in for telegram.Bot: has an id/username and records every reply
+    in `sent` as (update id, method, chat id, args, kwargs). Pass
+    record=False to only count them. `unreachable` maps chat ids to a
+    reason from UNREACHABLE that send_message() fails with.
+    """
+
+    def __init__(self, id=1, username="wetg_fake_bot", first_name="WETG Bot", record=True, unreachable=None):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.recording = record
+        self.unreachable = unreachable or {}
+        self.sent = []
+        self.count = 0
+        self.message_ids = itertools.count(1)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        reason = self.unreachable.get(chat_id)
+        if reason is not None:
+            error, message = UNREACHABLE[reason]
+            raise error(message)
+        self.record(None, "send_message", chat_id, (text,), kwargs)
+        return FakeMessage(self, FakeChat(chat_id), text=text)
+
+    def record(self, update_id, method, chat_id, args, kwargs):
+        self.count += 1
+        if self.recording:
+            self.sent.append((update_id, method, chat_id, args, kwargs))
+
+    def clear(self):
+        self.sent.clear()
+        self.count = 0
+
+
+class FakeContext:
+    """Stands in for the PTB callback context: the interpreter only reads .bot."""
+
+    __slots__ = ("bot",)
+
+    def __init__(self, bot):
+        self.bot = bot
@@ -0,0 +1,140 @@
+"""
+WETG v7 "Super Weox" — Minimal asyncio HTTP/1.1 server
+
+Just enough HTTP for the webhook receiver and the /metrics endpoint, so WETG
+needs no web framework: keep-alive, Content-Length bodies, exact-path routes.
+"""
+
+import asyncio
+from urllib.parse import urlsplit, parse_qs
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = parse_qs(parts.query)
+        self.headers = headers
+        self.body = body
+
+
+class Response:
+    __slots__ = ("status", "body", "content_type")
+
+    def __init__(self, status=200, body=b"", content_type="text/plain; charset=utf-8"):
+        self.status = status
+        self.body = body.encode() if isinstance(body, str) else body
+        self.content_type = content_type
+
+    def encode(self, keep_alive):
+        head = (
+            f"HTTP/1.1 {self.status} {REASONS.get(self.status, 'Unknown')}\r\n"
+            f"Content-Type: {self.content_type}\r\n"
+            f"Content-Length: {len(self.body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + self.body
+
+
+class HTTPServer:
+    """
+    Route table of (method, path) → async handler(Request) -> Response.
+
+    Example:
+        server = HTTPServer("127.0.0.1", 8080)
+        server.route("GET", "/ping", handler)
+        await server.start()
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, ssl=None, max_body=1 << 20, idle_timeout=75):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self.routes = {}
+        self._server = None
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    async def start(self):
+        if self._server is not None:
+            return   # shared by several webhooks: already serving
+        self._server = await asyncio.start_server(self._serve, self.host, self.port, ssl=self.ssl)
+        if not self.port:
+            # port 0: pick up the port the OS assigned
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close" and "1.1" in version
+                length = int(headers.get("content-length") or 0)
+                if length > self.max_body:
+                    writer.write(Response(413, "too large").encode(False))
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                response = await self._dispatch(Request(method, target, headers, body))
+                writer.write(response.encode(keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _dispatch(self, request):
+        handler = self.routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self.routes):
+                return Response(405, "method not allowed")
+            return Response(404, "not found")
+        try:
+            return await handler(request)
+        except Exception as e:
+            print(f"⚠️  HTTP handler error: {e}")
+            return Response(500, "internal error")
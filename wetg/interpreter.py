@@ -1,37 +1,100 @@
 """
 WETG v7 "Super Weox" — Interpreter core
+
+python-telegram-bot is imported where it is first needed (building a
+keyboard, sending a photo, start()), so parsing, checking and benchmarking
+a script never pay for it.
 """
 
+from __future__ import annotations
+
 import asyncio
+import contextvars
 import random
 import os
-
-from telegram import (
-    Update,
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-)
-from telegram.ext import (
-    ApplicationBuilder,
-    CommandHandler,
-    MessageHandler,
-    filters,
-    ContextTypes,
+import secrets
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from telegram import Update, InlineKeyboardMarkup
+    from telegram.ext import ContextTypes
+
+from .scope import Scope
+from .state import StateStore, MemoryStore
+from .conversation import ConversationTable
+from .dispatch import index_block, UsermsgIndex
+from .webhook import WebhookServer
+from .scheduler import ChatScheduler
+from .outbox import Outbox
+from .media import MediaCache, MediaLoader, is_url
+from .metrics import Metrics, BlockTimer
+from .profiler import Profiler
+from .httpserver import HTTPServer
+from .watch import ScriptWatcher
+from .cache import load as load_cache, save as save_cache
+from .lazy import LazyModule, module_exists
+from .budget import Limits, BudgetExceeded, Watchdog, current as current_budget, run_limited
+from .broadcast import BroadcastJob
+from .compiler import (
+    Block,
+    Keyboard,
+    EVAL_GLOBALS,
+    button_kind,
+    compile_block,
+    render,
+    static_media,
+    OP_SEND,
+    OP_SEND_WITH,
+    OP_ASK,
+    OP_IF,
+    OP_JUMP,
+    OP_LOOP,
+    OP_STOP,
+    OP_SET,
+    OP_CALL,
+    OP_BROADCAST,
 )
 
 
 # ------------------ USER & BOT INFO ------------------
 
 class User:
-    def __init__(self, tg_user):
+    def __init__(self, tg_user, vars=None):
         self.id = tg_user.id
         self.name = tg_user.first_name
         self.username = tg_user.username or ""
+        self.vars = {} if vars is None else vars
+
+    def __getattr__(self, name):
+        # user.<key> falls back to the per-user state set via `set user.key=…`
+        try:
+            return self.__dict__["vars"][name]
+        except KeyError:
+            raise AttributeError(name) from None
 
     def __format__(self, spec):
         return self.name
 
 
+class Chat:
+    def __init__(self, tg_chat, vars=None):
+        self.id = tg_chat.id if tg_chat else 0
+        self.type = tg_chat.type if tg_chat else ""
+        self.title = (tg_chat.title if tg_chat else None) or ""
+        self.vars = {} if vars is None else vars
+
+    def __getattr__(self, name):
+        # chat.<key> falls back to the per-chat state set via `set chat.key=…`
+        try:
+            return self.__dict__["vars"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __format__(self, spec):
+        return self.title or str(self.id)
+
+
 class BotInfo:
     def __init__(self, bot):
         self.id = bot.id
@@ -42,6 +105,36 @@ class BotInfo:
         return self.name
 
 
+def keyboard_markup(keyboard: Keyboard, scope) -> InlineKeyboardMarkup:
+    """Telegram markup for a compiled keyboard; static keyboards are built only once."""
+    if keyboard.static and keyboard.markup is not None:
+        return keyboard.markup
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+    rows = []
+    for row in keyboard.rows:
+        buttons = []
+        for label, kind, value in row:
+            value = render(value, scope)
+            if kind == "auto":
+                kind = button_kind(value)
+            if kind == "url":
+                buttons.append(InlineKeyboardButton(render(label, scope), url=value))
+            else:
+                buttons.append(InlineKeyboardButton(render(label, scope), callback_data=value))
+        rows.append(buttons)
+    markup = InlineKeyboardMarkup(rows)
+    if keyboard.static:
+        keyboard.markup = markup
+    return markup
+
+
+def ask_key(update) -> tuple:
+    """Conversation key for pending asks: one per user per chat."""
+    chat = update.effective_chat
+    return (chat.id if chat else 0, update.effective_user.id)
+
+
 # ------------------ WETG INTERPRETER ------------------
 
 class Wetg:
@@ -64,260 +157,622 @@ class Wetg:
     VERSION = "7"
     VERSION_HEADER = "Super Weox"
 
-    def __init__(self, code: str):
+    def __init__(
+        self,
+        code: str,
+        store: StateStore = None,
+        ask_ttl: float = 3600,
+        max_asks: int = 100_000,
+        concurrency: int = 16,
+        outbox: Outbox = None,
+        media: MediaCache = None,
+        media_budget: int = 32 << 20,
+        metrics=None,
+        profile: bool = False,
+        name: str = "bot",
+        limits: Limits = None,
+    ):
         self.code = code.splitlines()
+        self.name = name
+        self.store = store or MemoryStore()
         self.token = None
         self.commands = {}
         self.usermsg_blocks = []
         self.variables = {}
-        self.asking = {}
+        self.asking = ConversationTable(ttl=ask_ttl, max_size=max_asks)
+        self.scheduler = ChatScheduler(concurrency)
+        self.outbox = outbox or Outbox()
+        self.media = media if media is not None else MediaCache()
+        self.assets = MediaLoader(media_budget)
+        self.media_paths = []
+        self.routes = {}
+        self.callbacks = {}
         self.functions = {}
         self.imports = {}
+        self.declared = {}   # top-level `set` values as written in the script
+        self.compiled = {}   # block source → (first line, Block), reused by reload()
+        self.recompiled = 0
+        self.cached = False  # whether the last parse() came from a .wetgc cache
+        self.usermsg_index = UsermsgIndex([])
+        self.globals = Scope(self.variables, Scope(self.imports, Scope({"random": random})))
+        # metrics=True for a private registry, or pass a Metrics to share one
+        self.metrics = Metrics() if metrics is True else metrics or None
+        if self.metrics is not None:
+            self.metrics.watch(self)
+        self.profiler = Profiler(self.code) if profile else None
+        # per-update execution budgets (see wetg.budget); limits=False turns them off
+        self.limits = Limits() if limits is None else limits or None
+        self.watchdog = None
+        if self.limits is not None and self.limits.seconds:
+            self.watchdog = Watchdog(interval=min(1.0, self.limits.seconds / 10))
+        self.broadcasts = set()   # running `broadcast` tasks
+        self.app = None
+        self.webhook = None
+        self.metrics_server = None
 
     # ------------------ PARSER ------------------
 
-    def parse(self):
-        """Parse the .wetg source code into an internal command/block structure."""
+    def parse(self, cache: str = None):
+        """Parse the .wetg source code and compile every block into instructions.
+
+        The handler tables are built aside and swapped in at the end, so
+        parsing again (see reload()) never leaves a half-updated bot. Blocks
+        whose source did not change since the last parse are reused.
+
+        With `cache` (a .wetgc path, see wetg.cache) the compiled script is
+        loaded from there when it matches the source, and saved there after
+        a parse otherwise.
+        """
+        source = "\n".join(self.code)
+        if cache:
+            state = load_cache(cache, source)
+            if state is not None:
+                self.recompiled = 0
+                self.cached = True
+                self._install(state)
+                return
+        state = self._parse()
+        self.cached = False
+        self._install(state)
+        if cache:
+            try:
+                save_cache(cache, source, state)
+            except Exception as e:
+                print(f"⚠️  Cannot write {cache}: {e}")
+
+    def _parse(self) -> dict:
+        """Compile the source into everything _install() needs (and the cache stores)."""
         current_cmd = None
-        current_block = []
-        is_usermsg = False
         current_function = None
-        function_block = []
+        current_block = []
+        sections = []
+        declared = {}
+        imports = []
+        token = None
 
-        for line in self.code:
-            if not line.strip() or line.strip().startswith("#"):
+        for lineno, line in enumerate(self.code, 1):
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
                 continue
             indent = len(line) - len(line.lstrip())
-            stripped = line.strip()
 
             if stripped.startswith("wetg "):
                 continue
             if stripped.startswith("import "):
-                for m in stripped[7:].split(","):
-                    m = m.strip()
-                    try:
-                        self.imports[m] = __import__(m)
-                    except Exception:
-                        print(f"⚠️  Failed to import: {m}")
+                imports.extend(m.strip() for m in stripped[7:].split(","))
                 continue
             if stripped.startswith("bot "):
                 try:
-                    self.token = stripped.split('"')[1]
+                    token = stripped.split('"')[1]
                 except Exception:
                     pass
                 continue
             if stripped.startswith("function "):
-                if current_function:
-                    self.functions[current_function] = function_block
+                sections.append((current_cmd, current_function, current_block))
+                current_cmd = None
                 current_function = stripped[9:].strip()
-                function_block = []
+                current_block = []
                 continue
-            if stripped.startswith("set "):
+            if stripped.startswith("set ") and indent == 0:
                 try:
                     key, val = stripped[4:].split("=", 1)
-                    self.variables[key.strip()] = val.strip()
+                    declared[key.strip()] = val.strip()
                 except Exception:
                     print(f"⚠️  Invalid set: {stripped}")
                 continue
             if stripped.startswith("on "):
-                if current_cmd:
-                    if is_usermsg:
-                        self.usermsg_blocks.append(current_block)
-                    else:
-                        self.commands[current_cmd] = current_block
+                sections.append((current_cmd, current_function, current_block))
                 current_cmd = stripped[3:].strip()
+                current_function = None
                 current_block = []
-                is_usermsg = (current_cmd == "usermsg")
                 continue
 
-            if current_function:
-                function_block.append((indent, stripped))
-            else:
-                current_block.append((indent, stripped))
-
-        if current_function:
-            self.functions[current_function] = function_block
-        if current_cmd:
-            if is_usermsg:
-                self.usermsg_blocks.append(current_block)
-            else:
-                self.commands[current_cmd] = current_block
+            current_block.append((lineno, indent, stripped))
+
+        sections.append((current_cmd, current_function, current_block))
+
+        commands = {}
+        usermsg_blocks = []
+        callbacks = {}
+        functions = {}
+        compiled = {}
+        self.recompiled = 0
+        for cmd, function, lines in sections:
+            if function:
+                functions[function] = self._compile(function, lines, compiled)
+            elif cmd == "usermsg":
+                usermsg_blocks.append(self._compile(cmd, lines, compiled))
+            elif cmd and cmd.startswith("button "):
+                callbacks[cmd[7:].strip()] = self._compile(cmd, lines, compiled)
+            elif cmd:
+                commands[cmd] = self._compile(cmd, lines, compiled)
+
+        regex = "re" in imports
+        for block in usermsg_blocks:
+            index_block(block, regex)
+
+        return {
+            "token": token,
+            "imports": imports,
+            "declared": declared,
+            "compiled": compiled,
+            "commands": commands,
+            "routes": {cmd.lstrip("/").lower(): block for cmd, block in commands.items()},
+            "usermsg_blocks": usermsg_blocks,
+            "usermsg_index": UsermsgIndex(usermsg_blocks),
+            "callbacks": callbacks,
+            "functions": functions,
+            "media_paths": static_media(
+                [*commands.values(), *usermsg_blocks, *callbacks.values(), *functions.values()]
+            ),
+        }
+
+    def _install(self, state: dict):
+        """Make a parsed script the running one."""
+        if state["token"]:
+            self.token = state["token"]
+        for m in state["imports"]:
+            if m in self.imports:
+                continue
+            if not module_exists(m):
+                print(f"⚠️  Failed to import: {m}")
+                continue
+            # imported on first use, see wetg.lazy
+            self.imports[m] = LazyModule(m, self.imports)
+
+        # a top-level `set` only overrides the runtime value when its own line changed
+        declared = state["declared"]
+        for key, val in declared.items():
+            if self.declared.get(key) != val:
+                self.variables[key] = val
+
+        # ---- swap in the new tables (no await in between) ----
+        self.declared = declared
+        self.compiled = state["compiled"]
+        self.commands = state["commands"]
+        self.routes = state["routes"]
+        self.usermsg_blocks = state["usermsg_blocks"]
+        self.usermsg_index = state["usermsg_index"]
+        self.callbacks = state["callbacks"]
+        self.functions = state["functions"]
+        self.media_paths = state["media_paths"]
+
+    def _compile(self, name, lines, compiled):
+        """Compile one `on` / `function` body, or reuse it from the previous parse."""
+        first = lines[0][0] if lines else 0
+        key = (name, tuple((lineno - first, indent, text) for lineno, indent, text in lines))
+        cached = self.compiled.get(key)
+        if cached is None:
+            block = compile_block(name, lines)
+            self.recompiled += 1
+        else:
+            old_first, block = cached
+            if old_first != first:
+                # same code, moved in the file: only the line numbers change
+                block = Block(name, block.code, [n + first - old_first for n in block.lines])
+        compiled[key] = (first, block)
+        return block
+
+    def reload(self, code: str) -> int:
+        """Switch to a new version of the script while the bot keeps running.
+
+        Handlers already running, and pending asks, finish on the code they
+        started with. Runtime state is kept: user./chat. variables, globals
+        changed by `set`, queued updates and the Telegram connection.
+        Returns the number of blocks that had to be compiled.
+
+        Example:
+            with open("mybot.wetg") as f:
+                bot.reload(f.read())
+        """
+        old_code, token = self.code, self.token
+        self.code = code.splitlines()
+        try:
+            self.parse()
+        except Exception:
+            self.code = old_code
+            raise
+        if token and self.token != token:
+            print("⚠️  The bot token changed: restart the bot to use the new one")
+            self.token = token
+        if self.profiler is not None:
+            self.profiler.source = list(self.code)
+        return self.recompiled
 
     # ------------------ BLOCK RUNNER ------------------
 
+    async def reply(self, update: Update, method: str, *args, **kwargs):
+        """Call update.effective_message.<method>(...) through the rate-limited outbox."""
+        budget = current_budget()
+        if budget is not None:
+            budget.send()
+        message = update.effective_message
+        chat = update.effective_chat
+        call = lambda: getattr(message, method)(*args, **kwargs)
+        if self.metrics is not None:
+            call = self.metrics.timed_api(self.name, method, call)
+        if budget is None or budget.deadline == float("inf"):
+            return await self.outbox.send(chat.id if chat else 0, call)
+
+        # waiting for a flood-limit slot doesn't count against the time budget
+        async def timed(call=call):
+            budget.resume()
+            try:
+                return await call()
+            finally:
+                budget.pause()
+
+        budget.pause()
+        try:
+            return await self.outbox.send(chat.id if chat else 0, timed)
+        finally:
+            budget.resume()
+
+    async def send_photo(self, update: Update, context: ContextTypes.DEFAULT_TYPE, source: str):
+        """Reply with a photo, reusing the cached file_id of an earlier upload."""
+        from telegram.error import BadRequest
+
+        bot_id = context.bot.id
+        url = is_url(source)
+        # the cache stats/hashes local files and rewrites its JSON file:
+        # keep all of it off the event loop
+        file_id = await asyncio.to_thread(self.media.lookup, bot_id, source)
+        if file_id is not None:
+            try:
+                return await self.reply(update, "reply_photo", file_id)
+            except BadRequest:
+                await asyncio.to_thread(self.media.forget, bot_id, source)
+
+        if url:
+            message = await self.reply(update, "reply_photo", source)
+        else:
+            data = await self.assets.read(source)
+            message = await self.reply(
+                update, "reply_photo", data, filename=os.path.basename(source)
+            )
+        if message is not None and message.photo:
+            file_id = message.photo[-1].file_id
+            await asyncio.to_thread(self.media.store, bot_id, source, file_id)
+        return message
+
+    async def new_scope(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> Scope:
+        """Build the variable scope for one update.
+
+        Lookup order: locals → chat state → user state → globals → imports.
+        """
+        tg_user = update.effective_user
+        tg_chat = update.effective_chat
+        message = update.message
+        query = update.callback_query
+        user_vars = await self.store.load("user", tg_user.id)
+        chat_vars = await self.store.load("chat", tg_chat.id) if tg_chat else {}
+        return Scope({
+            "user": User(tg_user, user_vars),
+            "chat": Chat(tg_chat, chat_vars),
+            "bot": BotInfo(context.bot),
+            "msg": message,
+            "usermsg": message.text if message else (query.data if query else ""),
+        }, Scope(chat_vars, Scope(user_vars, self.globals)))
+
     async def run_block(
         self,
-        block: list,
+        block: Block,
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
+        scope: Scope = None,
+        pc: int = 0,
+        loops: dict = None,
     ):
-        """Execute a parsed block of WETG instructions."""
-        user = User(update.effective_user)
-        botinfo = BotInfo(context.bot)
-        local_vars = self.variables.copy()
-        local_vars.update({
-            "user": user,
-            "bot": botinfo,
-            "msg": update.message,
-            "usermsg": update.message.text if update.message else "",
-            "random": random,
-            **self.imports,
-        })
-
-        i = 0
-        loop_stack = []
-
-        while i < len(block):
-            indent, line = block[i]
+        """Execute a compiled block of WETG instructions.
+
+        `scope` is passed down by `call` so functions share the caller's locals;
+        `pc` / `loops` resume a block parked by `ask`.
+        """
+        if self.profiler is None:
+            return await self._execute(block, update, context, scope, pc, loops, None)
+        frame = self.profiler.enter(block)
+        try:
+            return await self._execute(block, update, context, scope, pc, loops, frame)
+        finally:
+            frame.exit()
+
+    async def _execute(self, block, update, context, scope, pc, loops, frame):
+        if scope is None:
+            scope = await self.new_scope(update, context)
+
+        code = block.code
+        end = len(code)
+        if loops is None:
+            loops = {}
+
+        metrics = self.metrics
+        if metrics is None:
+            fmt, evaluate = render, eval
+        else:
+            timer = BlockTimer()
+            fmt, evaluate = timer.render, timer.eval
+        executed = 0
+        budget = current_budget()
+
+        while pc < end:
+            ins = code[pc]
+            op = ins.op
+            executed += 1
+            if frame is not None:
+                frame.step(pc)
+            if budget is not None:
+                budget.instructions -= 1
+                if budget.instructions < 0:
+                    budget.exceeded("instructions")
 
             try:
-                # --- ask ---
-                if line.startswith("ask "):
-                    q = line[4:].strip().strip('"')
-                    try:
-                        q = q.format(**local_vars)
-                    except Exception:
-                        pass
-                    await update.message.reply_text(q)
-                    self.asking[update.effective_user.id] = True
-                    return
-
-                # --- send ... with ... ---
-                elif line.startswith("send ") and " with " in line:
-                    parts = line.split(" with ", 1)
-                    text = parts[0][5:].strip().strip('"')
-                    send_type = parts[1].strip()
-                    try:
-                        text = text.format(**local_vars)
-                    except Exception:
-                        pass
-
-                    if send_type == "button":
-                        keyboard = None
-                        for j in range(i - 1, -1, -1):
-                            if block[j][1].startswith("button ="):
-                                btn_part = block[j][1].split("=", 1)[1].strip()
-                                try:
-                                    btn_label, btn_url = (
-                                        btn_part.strip("[]").replace('"', "").split(",", 1)
-                                    )
-                                    keyboard = InlineKeyboardMarkup([[
-                                        InlineKeyboardButton(
-                                            btn_label.strip(), url=btn_url.strip()
-                                        )
-                                    ]])
-                                except Exception:
-                                    pass
-                                break
-                        await update.message.reply_text(text, reply_markup=keyboard)
-
-                    elif send_type == "image":
-                        try:
-                            if text.startswith("http"):
-                                await update.message.reply_photo(text)
-                            else:
-                                with open(text, "rb") as img:
-                                    await update.message.reply_photo(img)
-                        except Exception as e:
-                            await update.message.reply_text(f"⚠️ Cannot send image: {e}")
-
-                    elif send_type == "markdown":
-                        await update.message.reply_text(text, parse_mode="Markdown")
-
-                    elif send_type == "html":
-                        await update.message.reply_text(text, parse_mode="HTML")
-
                 # --- send ---
-                elif line.startswith("send "):
-                    text = line[5:].strip().strip('"')
-                    try:
-                        text = text.format(**local_vars)
-                    except Exception:
-                        pass
-                    await update.message.reply_text(text)
-
-                # --- loop ---
-                elif line.startswith("loop "):
-                    parts = line[5:].split()
-                    try:
-                        times = int(parts[0]) if "times" in parts else int(local_vars.get(parts[0], 0))
-                    except Exception:
-                        times = 0
-                    loop_stack.append((i, times))
-                    i += 1
-                    continue
-
-                # --- stop ---
-                elif line == "stop":
-                    if loop_stack:
-                        idx, count = loop_stack.pop()
-                        if count > 1:
-                            loop_stack.append((idx, count - 1))
-                            i = idx + 1
-                            continue
+                if op == OP_SEND:
+                    text = fmt(ins.text, scope)
+                    await self.reply(update, "reply_text", text)
 
                 # --- if / elif ---
-                elif line.startswith("if ") or line.startswith("elif "):
-                    prefix = "if " if line.startswith("if ") else "elif "
-                    cond = line[len(prefix):].strip()
-                    usermsg_val = local_vars.get("usermsg", "")
-                    cond = cond.replace("{usermsg}", repr(usermsg_val))
+                elif op == OP_IF:
+                    if ins.index is not None:
+                        target = ins.index.lookup(scope["usermsg"])
+                        if target is not None:
+                            pc = target
+                            continue
                     try:
-                        result = eval(cond, {"__builtins__": {}}, local_vars)
+                        result = evaluate(ins.cond, EVAL_GLOBALS, scope)
                     except Exception:
                         result = False
                     if not result:
-                        curr_indent = indent
-                        i += 1
-                        while i < len(block) and block[i][0] > curr_indent:
-                            i += 1
+                        pc = ins.target
                         continue
 
-                elif line.startswith("else"):
-                    i += 1
+                # --- end of a taken branch / else ---
+                elif op == OP_JUMP:
+                    pc = ins.target
                     continue
 
                 # --- runtime set ---
-                elif line.startswith("set "):
-                    try:
-                        key, val = line[4:].split("=", 1)
-                        key = key.strip()
-                        val = val.strip()
+                elif op == OP_SET:
+                    val = fmt(ins.value, scope)
+                    if ins.target is None:
+                        scope[ins.key] = val
+                        self.variables[ins.key] = val
+                    else:
+                        owner = scope[ins.target]
+                        owner.vars[ins.key] = val
+                        if owner.id:
+                            # chat id 0: no chat (e.g. inline-mode callbacks), nothing to keep
+                            await self.store.write(ins.target, owner.id, owner.vars)
+
+                # --- send ... with ... ---
+                elif op == OP_SEND_WITH:
+                    text = fmt(ins.text, scope)
+                    kind = ins.kind
+
+                    if kind == "button":
+                        keyboard = ins.button
+                        markup = keyboard_markup(keyboard, scope) if keyboard else None
+                        await self.reply(update, "reply_text", text, reply_markup=markup)
+
+                    elif kind == "image":
+                        try:
+                            await self.send_photo(update, context, text)
+                        except BudgetExceeded:
+                            raise
+                        except Exception as e:
+                            await self.reply(update, "reply_text", f"⚠️ Cannot send image: {e}")
+
+                    elif kind == "markdown":
+                        await self.reply(update, "reply_text", text, parse_mode="Markdown")
+
+                    elif kind == "html":
+                        await self.reply(update, "reply_text", text, parse_mode="HTML")
+
+                # --- loop ---
+                elif op == OP_LOOP:
+                    times = ins.count
+                    if type(times) is not int:
                         try:
-                            val = val.format(**local_vars)
+                            times = int(scope.get(times, 0))
                         except Exception:
-                            pass
-                        local_vars[key] = val
-                        self.variables[key] = val
-                    except Exception:
-                        pass
+                            times = 0
+                    if times <= 0:
+                        pc = ins.end
+                        continue
+                    if budget is not None:
+                        budget.loop(times)
+                    loops[pc] = times
 
-                # --- call function ---
-                elif line.startswith("call "):
-                    fname = line[5:].strip()
-                    if fname in self.functions:
-                        await self.run_block(self.functions[fname], update, context)
+                # --- stop ---
+                elif op == OP_STOP:
+                    remaining = loops.get(ins.start, 1) - 1
+                    if remaining > 0:
+                        if budget is not None:
+                            # loop bodies without sends never yield: check the clock here
+                            budget.check_time()
+                        loops[ins.start] = remaining
+                        pc = ins.start + 1
+                        continue
 
-                # --- button definition line (skip silently) ---
-                elif line.startswith("button ="):
-                    pass
+                # --- call function ---
+                elif op == OP_CALL:
+                    if ins.name in self.functions:
+                        if budget is None:
+                            await self.run_block(self.functions[ins.name], update, context, scope)
+                        else:
+                            budget.enter()
+                            try:
+                                await self.run_block(self.functions[ins.name], update, context, scope)
+                            finally:
+                                budget.leave()
+
+                # --- broadcast (not charged to the sends budget: it runs on its own) ---
+                elif op == OP_BROADCAST:
+                    self.broadcast(context.bot, fmt(ins.text, scope))
 
+                # --- ask ---
+                elif op == OP_ASK:
+                    q = fmt(ins.text, scope)
+                    await self.reply(update, "reply_text", q)
+                    self.asking.put(ask_key(update), block, pc + 1, loops)
+                    break
+
+            except BudgetExceeded:
+                raise
             except Exception as e:
-                await update.message.reply_text(f"⚠️ Runtime error: {e}")
+                if metrics is not None:
+                    metrics.handler_errors.inc(self.name, block.name)
+                await self.reply(update, "reply_text", f"⚠️ Runtime error: {e}")
+
+            pc += 1
+
+        if metrics is not None:
+            metrics.record_block(self.name, block.name, executed, timer)
+
+    async def run_handler(self, block: Block, update: Update, context: ContextTypes.DEFAULT_TYPE, **kwargs):
+        """run_block() for a top-level handler, timed per block when metrics are on."""
+        budget = current_budget()
+        if budget is not None:
+            budget.handler = block.name
+        if self.metrics is None:
+            return await self.run_block(block, update, context, **kwargs)
+        start = time.perf_counter()
+        try:
+            await self.run_block(block, update, context, **kwargs)
+        finally:
+            self.metrics.handler_seconds.observe(time.perf_counter() - start, self.name, block.name)
+
+    def broadcast(self, bot, text: str, **options) -> asyncio.Task:
+        """Send `text` to every known user from a background task (see
+        wetg.broadcast) and return that task; its result is the
+        BroadcastResult. Options are passed to BroadcastJob.
+
+        Example:
+            task = wetg.broadcast(app.bot, "Maintenance at 22:00")
+        """
+        send = lambda user_id: bot.send_message(user_id, text)
+        if self.metrics is not None:
+            send = lambda user_id, send=send: self.metrics.timed_api(
+                self.name, "send_message", lambda: send(user_id)
+            )()
+        job = BroadcastJob(self.store, self.outbox, send, **options)
+
+        async def run():
+            result = await job.run()
+            print(f"📣 Broadcast done: {result.sent} sent, {result.failed} failed")
+            return result
+
+        # a fresh context: the job must not run under the budget of the
+        # update that started it
+        task = contextvars.Context().run(asyncio.create_task, run())
+        self.broadcasts.add(task)
+        task.add_done_callback(self.broadcasts.discard)
+        return task
+
+    def _count(self, kind):
+        if self.metrics is not None:
+            self.metrics.updates.inc(self.name, kind)
+
+    # ------------------ UPDATE ROUTER ------------------
+
+    async def process_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle one update within the execution budgets of `self.limits`."""
+        if self.limits is None:
+            return await self._route(update, context)
+        try:
+            await run_limited(self.limits, lambda: self._route(update, context), self.watchdog)
+        except BudgetExceeded as e:
+            if self.metrics is not None:
+                self.metrics.budget_exceeded.inc(self.name, e.handler or "", e.limit)
+            try:
+                await self.reply(update, "reply_text", f"⚠️ Stopped: {e}")
+            except Exception:
+                pass
 
-            i += 1
+    async def _route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Route one update: /commands to their `on` block, other text to usermsg,
+        presses of callback buttons to their `on button <data>` block."""
+        user = update.effective_user
+        chat = update.effective_chat
+        if user is not None and chat is not None and chat.id == user.id:
+            # a private chat: this user can be broadcast to
+            self.store.remember_user(user.id)
+        query = update.callback_query
+        if query is not None:
+            try:
+                await query.answer()
+            except Exception:
+                pass
+            block = self.callbacks.get(query.data)
+            if block is not None and update.effective_user is not None:
+                self._count("callback")
+                await self.run_handler(block, update, context)
+            else:
+                self._count("ignored")
+            return
+
+        message = update.message
+        if message is None or message.text is None or update.effective_user is None:
+            self._count("ignored")
+            return
+        text = message.text
+        if text.startswith("/"):
+            name, _, target = text.split(maxsplit=1)[0][1:].partition("@")
+            block = self.routes.get(name.lower())
+            if block is None or target and target.lower() != (context.bot.username or "").lower():
+                self._count("ignored")
+                return
+            self._count("command")
+            await self.run_handler(block, update, context)
+            return
+        await self.handle_usermsg(update, context)
+
+    async def _on_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """PTB entry point: queue the update behind earlier ones from the same chat."""
+        chat = update.effective_chat
+        await self.scheduler.put(
+            chat.id if chat else 0,
+            lambda: self.process_update(update, context),
+        )
 
     # ------------------ MESSAGE HANDLER ------------------
 
     async def handle_usermsg(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
-        uid = update.effective_user.id
-        if uid in self.asking:
-            self.variables["usermsg"] = update.message.text
-            del self.asking[uid]
-        for block in self.usermsg_blocks:
-            await self.run_block(block, update, context)
+        pending = self.asking.pop(ask_key(update))
+        if pending is not None and pending.pc < len(pending.block):
+            # the ask has follow-up lines: continue there with the answer as {usermsg}
+            self._count("answer")
+            await self.run_handler(
+                pending.block, update, context, pc=pending.pc, loops=pending.loops
+            )
+            return
+        self._count("usermsg")
+        scope = await self.new_scope(update, context)
+        blocks = self.usermsg_blocks
+        for n in self.usermsg_index.select(scope["usermsg"]):
+            await self.run_handler(blocks[n], update, context, scope=scope)
 
     # ------------------ TOKEN LOADER ------------------
 
@@ -340,8 +795,27 @@ class Wetg:
 
     # ------------------ BOT RUNNER ------------------
 
-    async def run(self):
-        """Start the Telegram bot. Call after parse()."""
+    async def start(
+        self,
+        mode: str = "polling",
+        listen: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/hook",
+        url: str = None,
+        secret_token: str = None,
+        queue_size: int = 1000,
+        ssl=None,
+        metrics_port: int = None,
+        request=None,
+        get_updates_request=None,
+        server: HTTPServer = None,
+    ):
+        """Connect to Telegram and start receiving updates; returns once running.
+
+        `request` / `get_updates_request` (telegram.request objects) and
+        `server` (an HTTPServer for webhooks) can be shared between bots —
+        see wetg.serve. Call stop() to shut down.
+        """
         self.load_token()
 
         if not self.token:
@@ -350,29 +824,118 @@ class Wetg:
                 '  • Add  bot "YOUR_TOKEN"  to your .wetg file\n'
                 "  • OR create config.txt with  TOKEN=YOUR_TOKEN"
             )
+        if mode not in ("polling", "webhook"):
+            raise RuntimeError(f"Unknown run mode: {mode} (use polling or webhook)")
 
-        app = ApplicationBuilder().token(self.token).build()
+        from telegram import Update
+        from telegram.ext import ApplicationBuilder, TypeHandler
 
-        for cmd, block in self.commands.items():
-            async def handler(
-                update: Update,
-                context: ContextTypes.DEFAULT_TYPE,
-                block=block,
-            ):
-                await self.run_block(block, update, context)
+        builder = ApplicationBuilder().token(self.token)
+        if request is not None:
+            builder = builder.request(request)
+        if get_updates_request is not None:
+            builder = builder.get_updates_request(get_updates_request)
+        app = self.app = builder.build()
 
-            app.add_handler(CommandHandler(cmd.lstrip("/"), handler))
+        for cmd in self.commands:
             print(f"✅ Registered /{cmd.lstrip('/')}")
+        app.add_handler(TypeHandler(Update, self._on_update))
+
+        webhook = self.webhook = None
+        if mode == "webhook":
+            if url and not secret_token:
+                secret_token = secrets.token_urlsafe(32)
+
+            async def feed(data):
+                await app.process_update(Update.de_json(data, app.bot))
+
+            webhook = self.webhook = WebhookServer(
+                feed,
+                listen=listen,
+                port=port,
+                path=path,
+                secret_token=secret_token,
+                queue_size=queue_size,
+                ssl=ssl,
+                server=server,
+            )
 
-        app.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_usermsg)
-        )
-
-        print("🚀 WETG Bot is running... Press Ctrl+C to stop.")
-
+        metrics_server = self.metrics_server = None
+        if metrics_port is not None:
+            if self.metrics is None:
+                self.metrics = Metrics()
+                self.metrics.watch(self)
+            if webhook is not None and metrics_port == webhook.server.port:
+                webhook.server.route("GET", "/metrics", self.metrics.handle)
+            else:
+                metrics_server = self.metrics_server = HTTPServer(listen, metrics_port)
+                metrics_server.route("GET", "/metrics", self.metrics.handle)
+
+        if self.media_paths:
+            count = await self.assets.preload(self.media_paths)
+            print(f"🖼  Preloaded {count}/{len(self.media_paths)} images")
+        await self.store.start()
+        self.asking.start()
+        self.scheduler.start()
+        self.outbox.start()
         await app.initialize()
         await app.start()
-        await app.updater.start_polling()
+        if webhook is None:
+            await app.updater.start_polling()
+        else:
+            if url:
+                await app.bot.set_webhook(url, secret_token=secret_token)
+            await webhook.start()
+            print(f"🌐 Webhook listening on {webhook.server.host}:{webhook.server.port}{webhook.path}")
+        if metrics_server is not None:
+            await metrics_server.start()
+            print(f"📊 Metrics on http://{listen}:{metrics_server.port}/metrics")
+
+    async def stop(self):
+        """Stop receiving updates, let queued work finish, then disconnect."""
+        app = self.app
+        if app is None:
+            return
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        if self.webhook is not None:
+            await self.webhook.stop()
+        elif app.updater.running:
+            await app.updater.stop()
+        await self.scheduler.stop()
+        for task in list(self.broadcasts):
+            task.cancel()
+        if self.broadcasts:
+            await asyncio.gather(*self.broadcasts, return_exceptions=True)
+        await self.outbox.stop()
+        if app.running:
+            await app.stop()
+        await app.shutdown()
+        await self.asking.stop()
+        await self.store.close()
+        self.app = None
+
+    async def run(self, profile_out: str = None, watch: str = None, **options):
+        """Start the Telegram bot and run until Ctrl+C. Call after parse().
+
+        mode="polling" (default) long-polls getUpdates. mode="webhook" serves
+        updates on http(s)://listen:port/path; pass `url` to register that
+        public URL with Telegram (otherwise set the webhook yourself).
+        `metrics_port` serves Prometheus metrics on http://listen:port/metrics
+        (the webhook server itself when it's the same port). With
+        Wetg(profile=True) a per-line profile is printed on shutdown and, with
+        `profile_out`, written there as collapsed stacks for flamegraphs.
+        With `watch` (the script's path) the bot reloads itself whenever
+        that file changes. Other options are passed to start().
+        """
+        await self.start(**options)
+
+        watcher = None
+        if watch:
+            watcher = ScriptWatcher(self, watch)
+            watcher.start()
+            print(f"👀 Watching {watch} for changes")
+        print("🚀 WETG Bot is running... Press Ctrl+C to stop.")
 
         try:
             await asyncio.Event().wait()
@@ -380,6 +943,12 @@ class Wetg:
             pass
         finally:
             print("\n🛑 Shutting down...")
-            await app.updater.stop()
-            await app.stop()
-            await app.shutdown()
\ No newline at end of file
+            if watcher is not None:
+                await watcher.stop()
+            await self.stop()
+            if self.profiler is not None:
+                print("⏱  Profile (slowest lines):")
+                print(self.profiler.report())
+                if profile_out:
+                    self.profiler.write_folded(profile_out)
+                    print(f"🔥 Collapsed stacks written to {profile_out}")
@@ -0,0 +1,57 @@
+"""
+WETG v7 "Super Weox" — Lazy imports
+
+`import json, requests` in a script used to import every module while the
+script was parsed, even for `wetg check`. Now each name is bound to a
+LazyModule that imports the real module the first time the script uses it,
+then puts the module itself in its place so later lookups cost nothing.
+"""
+
+import importlib
+import importlib.util
+
+
+def module_exists(name: str) -> bool:
+    """Whether `import name` can find the module, without running it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyModule:
+    """
+    Stands in for a module until an attribute is needed.
+
+    Example:
+        imports = {}
+        imports["json"] = LazyModule("json", imports)
+        imports["json"].dumps([1])   # imports json; imports["json"] is now the module
+    """
+
+    __slots__ = ("_name", "_namespace", "_module")
+
+    def __init__(self, name: str, namespace: dict = None):
+        self._name = name
+        self._namespace = namespace
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            # same result as the old eager __import__: the top-level package
+            module = self._module = __import__(self._name)
+            if self._namespace is not None and self._namespace.get(self._name) is self:
+                self._namespace[self._name] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        if self._module is not None:
+            return repr(self._module)
+        return f"<lazy module {self._name!r}>"
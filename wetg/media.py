@@ -0,0 +1,215 @@
+"""
+WETG v7 "Super Weox" — Media cache
+
+After a photo is uploaded once, Telegram hands back a file_id that can be
+sent again without re-uploading. MediaCache remembers those ids per bot:
+
+    local files  keyed by absolute path, validated by mtime + size, and by
+                 SHA-256 when the mtime changed (e.g. after a git checkout)
+    URLs         keyed by the URL
+
+With a `path` the cache is saved as JSON so restarts stay warm.
+
+MediaLoader keeps the bytes of local files off the event loop: paths known
+at compile time are preloaded into memory at startup (up to a size budget),
+everything else is read in a worker thread. Preloaded files are checked
+(mtime and size, also in a worker thread) and read again if they changed.
+
+MediaCache is used from worker threads (lookups hash files), so its entries
+and saves are guarded by a lock.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def is_url(source: str) -> bool:
+    return source.startswith("http")
+
+
+class MediaCache:
+    """
+    (bot id, photo source) → Telegram file_id.
+
+    Example:
+        cache = MediaCache("mybot.media.json")
+        bot = Wetg(code, media=cache)
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                print(f"⚠️  Ignoring unreadable media cache {path}: {e}")
+
+    @staticmethod
+    def _key(bot_id, source):
+        if not is_url(source):
+            source = os.path.abspath(source)
+        return f"{bot_id}:{source}"
+
+    def lookup(self, bot_id, source: str):
+        """Cached file_id for this source, or None if it must be uploaded."""
+        key = self._key(bot_id, source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry = dict(entry)
+        if not is_url(source):
+            try:
+                st = os.stat(source)
+            except OSError:
+                self.misses += 1
+                return None
+            if st.st_size != entry["size"]:
+                self.misses += 1
+                return None
+            if st.st_mtime_ns != entry["mtime"]:
+                # touched but maybe not changed: compare contents
+                if file_digest(source) != entry["sha256"]:
+                    self.misses += 1
+                    return None
+                entry["mtime"] = st.st_mtime_ns
+                with self._lock:
+                    if self._entries.get(key, {}).get("file_id") == entry["file_id"]:
+                        self._entries[key] = entry
+                self.save()
+        self.hits += 1
+        return entry["file_id"]
+
+    def store(self, bot_id, source: str, file_id: str):
+        """Remember the file_id Telegram returned for an upload of `source`."""
+        entry = {"file_id": file_id}
+        if not is_url(source):
+            try:
+                st = os.stat(source)
+                entry.update(mtime=st.st_mtime_ns, size=st.st_size, sha256=file_digest(source))
+            except OSError:
+                return
+        with self._lock:
+            self._entries[self._key(bot_id, source)] = entry
+        self.save()
+
+    def forget(self, bot_id, source: str):
+        """Drop an entry whose file_id Telegram rejected."""
+        with self._lock:
+            dropped = self._entries.pop(self._key(bot_id, source), None)
+        if dropped is not None:
+            self.save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def save(self):
+        """Write the cache atomically (no-op for an in-memory cache)."""
+        if not self.path:
+            return
+        # one tmp file per writer: threads and `wetg serve` bots share a cache
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with self._lock:
+                data = json.dumps(self._entries)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"⚠️  Could not save media cache {self.path}: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+class MediaLoader:
+    """
+    Reads local media without blocking the event loop.
+
+    Example:
+        loader = MediaLoader(budget=32 << 20)
+        await loader.preload(["menu.jpg", "logo.png"])
+        data = await loader.read("menu.jpg")
+    """
+
+    def __init__(self, budget: int = 32 << 20):
+        self.budget = budget
+        self.used = 0
+        self._files = {}   # absolute path → (mtime_ns, size, bytes)
+
+    def _load(self, paths):
+        loaded = {}
+        used = self.used
+        for path in paths:
+            try:
+                st = os.stat(path)
+                if used + st.st_size > self.budget:
+                    print(f"⚠️  Not preloading {path}: media budget of {self.budget} bytes reached")
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+                loaded[os.path.abspath(path)] = (st.st_mtime_ns, st.st_size, data)
+                used += len(data)
+            except OSError as e:
+                print(f"⚠️  Cannot preload {path}: {e}")
+        return loaded, used
+
+    async def preload(self, paths):
+        """Read `paths` into memory in a worker thread, stopping at the budget."""
+        loaded, self.used = await asyncio.to_thread(self._load, list(paths))
+        self._files.update(loaded)
+        return len(loaded)
+
+    async def read(self, path: str) -> bytes:
+        """Contents of `path`: from memory if preloaded and unchanged on disk,
+        else read in a worker thread."""
+        key = os.path.abspath(path)
+        entry = self._files.get(key)
+        if entry is None:
+            return await asyncio.to_thread(_read_file, path)
+        data, fresh = await asyncio.to_thread(_read_if_changed, key, entry)
+        if not fresh and self._files.get(key) is entry:
+            # changed since preloading: don't send stale bytes again
+            del self._files[key]
+            self.used -= len(entry[2])
+        return data
+
+    def clear(self):
+        self._files.clear()
+        self.used = 0
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _read_if_changed(path, entry):
+    """(bytes, True) from a preloaded entry still matching the file on disk,
+    else (the file's current bytes, False)."""
+    mtime, size, data = entry
+    try:
+        st = os.stat(path)
+        if st.st_mtime_ns == mtime and st.st_size == size:
+            return data, True
+    except OSError:
+        pass
+    return _read_file(path), False
@@ -0,0 +1,284 @@
+"""
+WETG v7 "Super Weox" — Metrics
+
+Counters and latency histograms for the interpreter, readable from Python
+(Metrics.snapshot()) and in the Prometheus text format (Metrics.render(),
+served on /metrics by `wetg run --metrics-port 9100`).
+
+    wetg_updates_total{kind}                  updates by route: command, usermsg, answer, callback, ignored
+    wetg_handler_seconds{handler}             wall time of each on-block run (histogram)
+    wetg_handler_errors_total{handler}        runtime errors inside a block
+    wetg_instructions_total{block}            instructions executed, per block / function
+    wetg_eval_seconds_total{block}            time spent evaluating if/elif conditions
+    wetg_format_seconds_total{block}          time spent rendering "{...}" templates
+    wetg_api_seconds{method}                  Bot API call latency, excluding queueing (histogram)
+    wetg_api_errors_total{method}             failed Bot API calls
+    wetg_budget_exceeded_total{handler,limit} updates stopped by an execution budget
+    plus gauges for queue depths and pending asks.
+
+Every series also carries a `bot` label (Wetg.name), so one registry can
+serve all the bots of `wetg serve`.
+"""
+
+import time
+from bisect import bisect_left
+
+from .compiler import render
+from .httpserver import Response
+
+# seconds; roughly Prometheus' defaults shifted down, handlers are fast
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _select(values, bot, convert):
+    """values keyed by label tuple → {label (or tuple): convert(value)}, optionally for one bot."""
+    out = {}
+    for labels, value in values.items():
+        if bot is not None:
+            if labels[:1] != (bot,):
+                continue
+            labels = labels[1:]
+        if not labels:
+            return convert(value)
+        out[labels[0] if len(labels) == 1 else labels] = convert(value)
+    return out
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ------------------ METRIC TYPES ------------------
+
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, self.labelnames, labels, value
+
+    def snapshot(self, bot=None):
+        return _select(self.values, bot, lambda value: value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics), one per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}   # labels → [bucket counts..., sum, count]
+
+    def observe(self, value, *labels):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 2)
+        i = bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            entry[i] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def samples(self):
+        names = self.labelnames + ("le",)
+        for labels, entry in self.values.items():
+            total = 0
+            for bound, count in zip(self.buckets, entry):
+                total += count
+                yield self.name + "_bucket", names, labels + (_number(bound),), total
+            yield self.name + "_bucket", names, labels + ("+Inf",), entry[-1]
+            yield self.name + "_sum", self.labelnames, labels, entry[-2]
+            yield self.name + "_count", self.labelnames, labels, entry[-1]
+
+    def snapshot(self, bot=None):
+        return _select(self.values, bot, lambda entry: {"count": entry[-1], "sum": entry[-2]})
+
+
+class Gauge:
+    """Values read from callbacks at scrape time, one callback per label combination."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}   # labels → read()
+
+    def set_function(self, read, *labels):
+        self.values[labels] = read
+
+    def samples(self):
+        for labels, read in self.values.items():
+            yield self.name, self.labelnames, labels, read()
+
+    def snapshot(self, bot=None):
+        return _select(self.values, bot, lambda read: read())
+
+
+# ------------------ REGISTRY ------------------
+
+class BlockTimer:
+    """Accumulates eval / format time for one run of a block."""
+
+    __slots__ = ("eval_time", "format_time")
+
+    def __init__(self):
+        self.eval_time = 0.0
+        self.format_time = 0.0
+
+    def render(self, text, scope):
+        start = time.perf_counter()
+        try:
+            return render(text, scope)
+        finally:
+            self.format_time += time.perf_counter() - start
+
+    def eval(self, code, globals, scope):
+        start = time.perf_counter()
+        try:
+            return eval(code, globals, scope)
+        finally:
+            self.eval_time += time.perf_counter() - start
+
+
+class Metrics:
+    """
+    Metric registry for one or more bots.
+
+    Example:
+        bot = Wetg(code, metrics=True)
+        ...
+        bot.metrics.snapshot(bot.name)["wetg_handler_seconds"]["/start"]   # {"count": 12, "sum": 0.004}
+        print(bot.metrics.render())                                         # Prometheus text format
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self.updates = self.counter("wetg_updates_total", "Updates received, by route", ("bot", "kind"))
+        self.handler_seconds = self.histogram(
+            "wetg_handler_seconds", "Wall time of each handler run", ("bot", "handler")
+        )
+        self.handler_errors = self.counter(
+            "wetg_handler_errors_total", "Runtime errors inside handlers", ("bot", "handler")
+        )
+        self.instructions = self.counter(
+            "wetg_instructions_total", "Instructions executed", ("bot", "block")
+        )
+        self.eval_seconds = self.counter(
+            "wetg_eval_seconds_total", "Time spent evaluating conditions", ("bot", "block")
+        )
+        self.format_seconds = self.counter(
+            "wetg_format_seconds_total", "Time spent rendering templates", ("bot", "block")
+        )
+        self.api_seconds = self.histogram(
+            "wetg_api_seconds", "Bot API call latency, excluding queueing", ("bot", "method")
+        )
+        self.api_errors = self.counter("wetg_api_errors_total", "Failed Bot API calls", ("bot", "method"))
+        self.budget_exceeded = self.counter(
+            "wetg_budget_exceeded_total", "Updates stopped by an execution budget", ("bot", "handler", "limit")
+        )
+        self.scheduler_queued = self.gauge("wetg_scheduler_queued", "Updates waiting for a worker", ("bot",))
+        self.scheduler_active = self.gauge("wetg_scheduler_active", "Updates being handled", ("bot",))
+        self.outbox_queued = self.gauge("wetg_outbox_queued", "Sends waiting for a flood-limit slot", ("bot",))
+        self.asks_pending = self.gauge("wetg_asks_pending", "Users with an unanswered ask", ("bot",))
+
+    def _add(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, labelnames=()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def watch(self, bot):
+        """Export queue depths and pending asks of `bot` as gauges."""
+        self.scheduler_queued.set_function(lambda: bot.scheduler.stats()["queued"], bot.name)
+        self.scheduler_active.set_function(lambda: bot.scheduler.active, bot.name)
+        self.outbox_queued.set_function(lambda: bot.outbox.stats()["queued"], bot.name)
+        self.asks_pending.set_function(lambda: len(bot.asking), bot.name)
+
+    def unwatch(self, name):
+        """Stop exporting the gauges of the bot called `name`."""
+        for gauge in (self.scheduler_queued, self.scheduler_active, self.outbox_queued, self.asks_pending):
+            gauge.values.pop((name,), None)
+
+    # ------------------ RECORDING ------------------
+
+    def record_block(self, bot, name, executed, timer):
+        self.instructions.inc(bot, name, amount=executed)
+        self.eval_seconds.inc(bot, name, amount=timer.eval_time)
+        self.format_seconds.inc(bot, name, amount=timer.format_time)
+
+    def timed_api(self, bot, method, call):
+        """Wrap a no-argument coroutine function so its latency and failures are recorded."""
+        async def timed():
+            start = time.perf_counter()
+            try:
+                return await call()
+            except Exception:
+                self.api_errors.inc(bot, method)
+                raise
+            finally:
+                self.api_seconds.observe(time.perf_counter() - start, bot, method)
+        return timed
+
+    # ------------------ EXPORT ------------------
+
+    def snapshot(self, bot: str = None) -> dict:
+        """Current values as plain dicts, keyed by metric name then label value(s).
+
+        With `bot`, only that bot's series, without the bot label.
+        """
+        return {name: metric.snapshot(bot) for name, metric in self._metrics.items()}
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        out = []
+        for metric in self._metrics.values():
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, labels, value in metric.samples():
+                out.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+        return "\n".join(out) + "\n"
+
+    async def handle(self, request):
+        """HTTPServer handler for GET /metrics."""
+        return Response(200, self.render(), "text/plain; version=0.0.4; charset=utf-8")
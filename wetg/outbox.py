@@ -0,0 +1,306 @@
+"""
+WETG v7 "Super Weox" — Outbound send queue
+
+Every Bot API call that sends a message goes through an Outbox, which keeps
+us under Telegram's flood limits instead of running into 429 RetryAfter:
+
+    global      ~30 messages / second
+    per chat    ~1 message / second (short bursts are fine)
+    per group   ~20 messages / minute
+
+Each limit is a token bucket. Sends to one chat stay in order; between chats
+interactive replies go before bulk sends. A RetryAfter puts the call back at
+the head of its chat's queue and pauses that chat for the requested time.
+
+Time comes from a Clock, so the whole queue can be driven by FakeClock and a
+fake Bot in tests and benchmarks.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+INTERACTIVE = 0
+BULK = 1
+
+# waits shorter than this count as "now" (float noise from bucket arithmetic)
+EPSILON = 1e-6
+
+
+# ------------------ CLOCKS ------------------
+
+class Clock:
+    """Time source used by the Outbox."""
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class FakeClock(Clock):
+    """Virtual time: sleep() advances the clock instead of waiting."""
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    async def sleep(self, seconds):
+        if seconds > 0:
+            self.time += seconds
+        await asyncio.sleep(0)
+
+
+# ------------------ TOKEN BUCKET ------------------
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, burst, now=0.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until):
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and self.blocked_until <= now
+
+
+# ------------------ OUTBOX ------------------
+
+def retry_after(error):
+    """Seconds to wait for a RetryAfter-style error, else None."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        return None
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+class _Job:
+    __slots__ = ("priority", "call", "future", "attempts")
+
+    def __init__(self, priority, call, future):
+        self.priority = priority
+        self.call = call
+        self.future = future
+        self.attempts = 0
+
+
+class Outbox:
+    """
+    Rate-limited queue of outbound Bot API calls.
+
+    Example:
+        outbox = Outbox()
+        message = await outbox.send(chat_id, lambda: bot.send_message(chat_id, "hi"))
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        global_burst: int = 5,
+        chat_rate: float = 1,
+        chat_burst: int = 3,
+        group_rate: float = 20 / 60,
+        group_burst: int = 5,
+        max_retries: int = 5,
+        clock: Clock = None,
+    ):
+        self.clock = clock or Clock()
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_burst, self.clock.now())
+        self._buckets = {}
+        self._chats = {}         # chat id → deque of queued jobs
+        self._scheduled = set()  # chats that are in a heap or have a call in flight
+        self._ready = []         # heap of (priority, seq, chat id): may send now
+        self._waiting = []       # heap of (time, seq, chat id): bucket is empty
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task = None
+        self._inflight = set()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def send(self, chat_id, call, priority: int = INTERACTIVE):
+        """Queue `call` (a no-argument coroutine function) and return its result."""
+        if self._task is None or self._task.done():
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.submit(chat_id, call, priority, future)
+        return await future
+
+    def submit(self, chat_id, call, priority: int = BULK, future=None):
+        """Queue `call` without waiting for it; returns the future of its result."""
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = deque()
+        queue.append(_Job(priority, call, future))
+        if chat_id not in self._scheduled:
+            self._scheduled.add(chat_id)
+            self._schedule(chat_id)
+        self._wake.set()
+        return future
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst, self.clock.now())
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, self.clock.now())
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _schedule(self, chat_id):
+        now = self.clock.now()
+        delay = self._bucket(chat_id).delay(now)
+        if delay <= EPSILON:
+            heapq.heappush(self._ready, (self._chats[chat_id][0].priority, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._waiting, (now + delay, next(self._seq), chat_id))
+
+    async def _sleep(self, timeout):
+        """Sleep for `timeout` seconds (None: forever) or until something is submitted."""
+        self._wake.clear()
+        waker = asyncio.ensure_future(self._wake.wait())
+        if timeout is None:
+            await waker
+            return
+        sleeper = asyncio.ensure_future(self.clock.sleep(timeout))
+        done, pending = await asyncio.wait({waker, sleeper}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+
+    async def _dispatch(self):
+        while True:
+            now = self.clock.now()
+            while self._waiting and self._waiting[0][0] <= now + EPSILON:
+                _, _, chat_id = heapq.heappop(self._waiting)
+                self._schedule(chat_id)
+            if not self._ready:
+                await self._sleep(self._waiting[0][0] - now if self._waiting else None)
+                continue
+            delay = self._global.delay(now)
+            if delay > EPSILON:
+                await self._sleep(delay)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            job = self._chats[chat_id].popleft()
+            if job.future.cancelled():
+                # whoever queued it stopped waiting (e.g. a handler over its budget)
+                self._next(chat_id)
+                continue
+            self._global.take(now)
+            self._bucket(chat_id).take(now)
+            task = asyncio.create_task(self._run(chat_id, job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+            if len(self._buckets) > 10_000 and not self._ready:
+                self._prune(now)
+
+    async def _run(self, chat_id, job):
+        try:
+            result = await job.call()
+        except Exception as e:
+            wait = retry_after(e)
+            if wait is not None and job.attempts < self.max_retries:
+                job.attempts += 1
+                self.retried += 1
+                self._chats[chat_id].appendleft(job)
+                self._bucket(chat_id).block(self.clock.now() + wait)
+            else:
+                self.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._next(chat_id)
+            self._wake.set()
+
+    def _next(self, chat_id):
+        """Schedule the chat's next job, or forget the chat if it has none."""
+        if self._chats[chat_id]:
+            self._schedule(chat_id)
+        else:
+            del self._chats[chat_id]
+            self._scheduled.discard(chat_id)
+
+    def _prune(self, now):
+        """Forget buckets of idle chats so the table doesn't grow forever."""
+        for chat_id in [c for c, b in self._buckets.items() if c not in self._scheduled and b.idle(now)]:
+            del self._buckets[chat_id]
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(q) for q in self._chats.values()),
+            "inflight": len(self._inflight),
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+    def start(self):
+        """Start the dispatcher on the running event loop."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._wake.set()
+            self._task = asyncio.create_task(self._dispatch())
+
+    async def join(self):
+        """Wait until everything queued so far has been sent (or has failed)."""
+        while self._chats or self._inflight:
+            await asyncio.sleep(0.01)
+
+    async def stop(self, drain_timeout: float = 10):
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
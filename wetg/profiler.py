@@ -0,0 +1,124 @@
+"""
+WETG v7 "Super Weox" — Script profiler
+
+Records, per .wetg source line, how often it ran and how long it took:
+
+    total   from the start of the instruction to the start of the next one,
+            so awaited sends and `call`ed functions are included
+    self    total minus the time spent inside called functions
+
+It also keeps collapsed stacks ("/start:4;greet:12 1830", microseconds of
+self time) that flamegraph.pl / speedscope / inferno read directly.
+
+    bot = Wetg(code, profile=True)
+    ...
+    print(bot.profiler.report())
+    bot.profiler.write_folded("mybot.folded")
+
+Each handler runs in its own asyncio task context, so concurrent chats keep
+separate call stacks.
+"""
+
+import time
+from contextvars import ContextVar
+
+_frame = ContextVar("wetg_profile_frame", default=None)
+
+
+class _Frame:
+    """One active run of a block."""
+
+    __slots__ = ("profiler", "block", "parent", "prefix", "pc", "start", "child", "entered", "token")
+
+    def __init__(self, profiler, block, parent):
+        self.profiler = profiler
+        self.block = block
+        self.parent = parent
+        # stack of the caller, down to the `call` line that got us here
+        self.prefix = f"{parent.prefix}{parent.label()};" if parent is not None else ""
+        self.pc = None
+        self.start = 0.0
+        self.child = 0.0
+        self.entered = time.perf_counter()
+        self.token = None
+
+    def label(self):
+        return f"{self.block.name}:{self.block.lines[self.pc]}"
+
+    def step(self, pc):
+        """Instruction `pc` starts now: close the previous one."""
+        now = time.perf_counter()
+        if self.pc is not None:
+            self._finish(now)
+        self.pc = pc
+        self.start = now
+        self.child = 0.0
+
+    def _finish(self, now):
+        total = now - self.start
+        self.profiler.record(self, total, total - self.child)
+
+    def exit(self):
+        now = time.perf_counter()
+        if self.pc is not None:
+            self._finish(now)
+        if self.parent is not None:
+            self.parent.child += now - self.entered
+        _frame.reset(self.token)
+
+
+class Profiler:
+    """
+    Per-line hit counts and timings for the blocks of one script.
+
+    `source` is the script's lines, used to show the code in report().
+    """
+
+    def __init__(self, source=()):
+        self.source = list(source)
+        self.lines = {}    # (block name, line) → [hits, total seconds, self seconds]
+        self.stacks = {}   # "a:1;b:7" → self seconds
+
+    def enter(self, block) -> _Frame:
+        frame = _Frame(self, block, _frame.get())
+        frame.token = _frame.set(frame)
+        return frame
+
+    def record(self, frame, total, own):
+        key = (frame.block.name, frame.block.lines[frame.pc])
+        entry = self.lines.get(key)
+        if entry is None:
+            entry = self.lines[key] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += total
+        entry[2] += own
+        stack = frame.prefix + frame.label()
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + own
+
+    def clear(self):
+        self.lines.clear()
+        self.stacks.clear()
+
+    # ------------------ OUTPUT ------------------
+
+    def report(self, limit: int = 30) -> str:
+        """The `limit` most expensive lines (by total time) as a table."""
+        rows = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        out = [f"{'line':>6} {'hits':>8} {'total ms':>10} {'self ms':>10} {'avg µs':>9}  block: source"]
+        for (name, lineno), (hits, total, own) in rows:
+            text = self.source[lineno - 1].strip() if 0 < lineno <= len(self.source) else ""
+            out.append(
+                f"{lineno:>6} {hits:>8} {total * 1000:>10.2f} {own * 1000:>10.2f} "
+                f"{total / hits * 1e6:>9.1f}  {name}: {text}"
+            )
+        return "\n".join(out)
+
+    def folded(self) -> str:
+        """Collapsed stacks, one "frame;frame value" line each, in microseconds."""
+        return "".join(
+            f"{stack} {max(1, round(seconds * 1e6))}\n" for stack, seconds in sorted(self.stacks.items())
+        )
+
+    def write_folded(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.folded())
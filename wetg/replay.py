@@ -0,0 +1,199 @@
+"""
+WETG v7 "Super Weox" — Offline update replay
+
+Feeds recorded Telegram updates (one JSON object per line, as returned by
+getUpdates or posted to a webhook) through the same pipeline as a live bot —
+per-chat scheduler, command routing, usermsg blocks, ask state, outbox —
+against the fake Bot from wetg.fake.
+
+    wetg replay mybot.wetg updates.jsonl                     # as fast as possible
+    wetg replay mybot.wetg updates.jsonl --speed 1           # original timing
+    wetg replay mybot.wetg updates.jsonl --out sends.jsonl   # record replies
+    wetg replay mybot.wetg updates.jsonl --expect sends.jsonl
+
+Timing comes from a float "_time" field when the recorder added one, else
+from the message date. Replies are written in update order (and send order
+within an update), so two runs of the same log can be diffed even though
+chats were handled concurrently.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+
+from .bench import percentile
+from .fake import FakeBot, FakeContext, FakeUpdate
+from .interpreter import Wetg
+from .outbox import Clock, FakeClock, Outbox
+
+
+# ------------------ INPUT ------------------
+
+def read_updates(path: str) -> list:
+    """Update dicts from a JSONL file; bad lines are reported and skipped."""
+    updates = []
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                print(f"⚠️  {path}:{lineno}: invalid JSON: {e}")
+                continue
+            if isinstance(data, dict):
+                updates.append(data)
+            else:
+                print(f"⚠️  {path}:{lineno}: not an update object")
+    return updates
+
+
+def update_time(data: dict):
+    """When the update arrived (seconds), or None if the record doesn't say."""
+    if "_time" in data:
+        return float(data["_time"])
+    message = data.get("message") or (data.get("callback_query") or {}).get("message") or {}
+    date = message.get("date")
+    return float(date) if date is not None else None
+
+
+# ------------------ OUTPUT ------------------
+
+def _jsonable(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, bytes):
+        return {"bytes": len(value), "sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is not None:
+        return _jsonable(to_dict())
+    return repr(value)
+
+
+def send_record(update_id, method, chat_id, args, kwargs) -> dict:
+    """One recorded reply as a JSON-ready dict."""
+    record = {"update_id": update_id, "method": method, "chat_id": chat_id}
+    if args:
+        record["text" if method == "reply_text" else "photo"] = _jsonable(args[0])
+    for key, value in kwargs.items():
+        record[key] = _jsonable(value)
+    return record
+
+
+def write_sends(path: str, records: list):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n")
+
+
+def compare_sends(records: list, path: str):
+    """Index and (expected, actual) of the first difference from `path`, or None."""
+    expected = read_updates(path)
+    for i in range(max(len(expected), len(records))):
+        want = expected[i] if i < len(expected) else None
+        got = json.loads(json.dumps(records[i], sort_keys=True)) if i < len(records) else None
+        if want != got:
+            return i, want, got
+    return None
+
+
+# ------------------ REPLAY ------------------
+
+class ReplayResult:
+    """Outcome of one replay. Latencies (arrival → handled) are in seconds."""
+
+    def __init__(self, updates, seconds, latencies, sends, failed):
+        latencies = sorted(latencies)
+        self.updates = updates
+        self.seconds = seconds
+        self.rate = updates / seconds if seconds else 0.0
+        self.p50 = percentile(latencies, 0.50)
+        self.p95 = percentile(latencies, 0.95)
+        self.p99 = percentile(latencies, 0.99)
+        self.max = latencies[-1] if latencies else 0.0
+        self.sends = sends      # list of send_record() dicts in update order
+        self.failed = failed
+
+    def report(self) -> str:
+        ms = 1000
+        return "\n".join([
+            f"  Updates        : {self.updates} in {self.seconds:.3f}s ({self.rate:,.0f}/s)",
+            f"  Latency        : p50 {self.p50 * ms:.3f}ms  p95 {self.p95 * ms:.3f}ms  "
+            f"p99 {self.p99 * ms:.3f}ms  max {self.max * ms:.3f}ms",
+            f"  Sends          : {len(self.sends)}",
+            f"  Failed         : {self.failed}",
+        ])
+
+
+async def replay_async(
+    code: str,
+    updates: list,
+    speed: float = 0,
+    bot: Wetg = None,
+    username: str = "wetg_fake_bot",
+    concurrency: int = 16,
+) -> ReplayResult:
+    """
+    Replay `updates` (dicts) through a Wetg built from `code`.
+
+    speed=0 sends them as fast as the bot takes them and runs flood limits on
+    virtual time; speed=1 keeps the recorded gaps (2 = twice as fast) with
+    real flood limits, reproducing the original load profile.
+    """
+    if bot is None:
+        clock = Clock() if speed else FakeClock()
+        bot = Wetg(code, concurrency=concurrency, outbox=Outbox(clock=clock))
+        bot.parse()
+    fake = FakeBot(username=username)
+    context = FakeContext(fake)
+    order = {}
+    latencies = [0.0] * len(updates)
+    now = time.perf_counter
+
+    def job(i, update, arrived):
+        async def handle():
+            try:
+                await bot.process_update(update, context)
+            finally:
+                latencies[i] = now() - arrived
+        return handle
+
+    bot.scheduler.start()
+    bot.outbox.start()
+    first = next((t for t in map(update_time, updates) if t is not None), None)
+    start = now()
+    try:
+        for i, data in enumerate(updates):
+            if speed and first is not None:
+                at = update_time(data)
+                if at is not None:
+                    delay = (at - first) / speed - (now() - start)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            update = FakeUpdate.from_dict(fake, data)
+            order[update.update_id] = i
+            chat = update.effective_chat
+            await bot.scheduler.put(chat.id if chat else 0, job(i, update, now()))
+        await bot.scheduler.join()
+        await bot.outbox.join()
+        elapsed = now() - start
+    finally:
+        await bot.scheduler.stop()
+        await bot.outbox.stop()
+
+    # stable sort: sends of one update keep their order
+    sent = sorted(fake.sent, key=lambda s: order.get(s[0], len(updates)))
+    return ReplayResult(
+        len(updates), elapsed, latencies, [send_record(*s) for s in sent], bot.scheduler.failed
+    )
+
+
+def replay(code: str, updates: list, **options) -> ReplayResult:
+    """Blocking wrapper around replay_async()."""
+    return asyncio.run(replay_async(code, updates, **options))
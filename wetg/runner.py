@@ -7,9 +7,10 @@ import os
 from .interpreter import Wetg
 
 
-def run_file(filepath: str):
+def run_file(filepath: str, **options):
     """
     Run a .wetg file. Blocking call — runs until Ctrl+C.
+    Keyword options are passed to Wetg (e.g. store=SQLiteStore("bot.db")).
 
     Example:
         from wetg_superweox import run_file
@@ -21,12 +22,12 @@ def run_file(filepath: str):
     with open(filepath, "r", encoding="utf-8") as f:
         code = f.read()
 
-    bot = Wetg(code)
+    bot = Wetg(code, **options)
     bot.parse()
     asyncio.run(bot.run())
 
 
-async def run_file_async(filepath: str):
+async def run_file_async(filepath: str, **options):
     """
     Async version of run_file. Use when you're already inside an async context.
 
@@ -41,6 +42,6 @@ async def run_file_async(filepath: str):
     with open(filepath, "r", encoding="utf-8") as f:
         code = f.read()
 
-    bot = Wetg(code)
+    bot = Wetg(code, **options)
     bot.parse()
     await bot.run()
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+WETG v7 "Super Weox" — Per-chat ordered update scheduler
+
+Updates from different chats run concurrently on up to `concurrency` worker
+tasks; updates from the same chat run strictly one after another, so
+ask/reply flows stay in order. Chats with a backlog take turns round-robin,
+so one hot chat can't starve the others. put() waits while more than
+`max_queued` updates are pending, which pushes back on the update source.
+"""
+
+import asyncio
+from collections import deque
+
+
+class ChatScheduler:
+    """
+    Example:
+        scheduler = ChatScheduler(concurrency=16)
+        scheduler.start()
+        scheduler.submit(chat_id, lambda: handle(update))
+        await scheduler.join()
+    """
+
+    def __init__(self, concurrency: int = 16, max_queued: int = 10_000):
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self._queues = {}
+        self._ready = asyncio.Queue()
+        self._workers = []
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._space = asyncio.Event()
+        self._space.set()
+        self.active = 0
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, key, job):
+        """Queue `job` (a no-argument coroutine function) behind earlier jobs for `key`."""
+        queue = self._queues.get(key)
+        if queue is None:
+            self._queues[key] = deque((job,))
+            self._ready.put_nowait(key)
+        else:
+            queue.append(job)
+        self._pending += 1
+        self._idle.clear()
+
+    async def put(self, key, job):
+        """Like submit(), but first wait until fewer than `max_queued` jobs are pending."""
+        while self._pending >= self.max_queued:
+            self._space.clear()
+            await self._space.wait()
+        self.submit(key, job)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._queues[key]
+            job = queue.popleft()
+            self.active += 1
+            try:
+                await job()
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️  Update for chat {key} failed: {e}")
+            finally:
+                self.active -= 1
+                self.processed += 1
+                self._pending -= 1
+                if self._pending < self.max_queued:
+                    self._space.set()
+            if queue:
+                self._ready.put_nowait(key)
+            else:
+                del self._queues[key]
+                if not self._pending:
+                    self._idle.set()
+
+    def backlog(self, key) -> int:
+        """Number of updates waiting for one chat."""
+        queue = self._queues.get(key)
+        return len(queue) if queue is not None else 0
+
+    def stats(self) -> dict:
+        """Queue depth and the most backed-up chat."""
+        hot_chat, hot_backlog = None, 0
+        for key, queue in self._queues.items():
+            if len(queue) > hot_backlog:
+                hot_chat, hot_backlog = key, len(queue)
+        return {
+            "queued": self._pending - self.active,
+            "active": self.active,
+            "chats": len(self._queues),
+            "max_backlog": hot_backlog,
+            "hot_chat": hot_chat,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        self._workers = [task for task in self._workers if not task.done()]
+        if not self._workers:
+            # (re)bind the queue and events to this loop, keeping queued chats
+            self._ready = asyncio.Queue()
+            for key in self._queues:
+                self._ready.put_nowait(key)
+            self._idle = asyncio.Event()
+            self._space = asyncio.Event()
+            if not self._pending:
+                self._idle.set()
+            if self._pending < self.max_queued:
+                self._space.set()
+        while len(self._workers) < self.concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def join(self):
+        """Wait until every submitted job has finished."""
+        await self._idle.wait()
+
+    async def stop(self, drain_timeout: float = 10):
+        """Give queued updates `drain_timeout` seconds, then cancel the workers."""
+        if self._workers:
+            try:
+                await asyncio.wait_for(self.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
@@ -0,0 +1,67 @@
+"""
+WETG v7 "Super Weox" — Variable scopes
+
+A Scope is one layer of variables linked to its parent. Creating a scope is
+O(1): layers are shared by reference, never copied.
+
+    execution locals → bot globals (set) → imports → builtins (random)
+"""
+
+from collections.abc import Mapping
+
+_MISSING = object()
+
+
+class Scope(Mapping):
+    """A chain of variable layers. Reads walk outwards, writes hit the innermost layer."""
+
+    __slots__ = ("vars", "parent")
+
+    def __init__(self, vars=None, parent=None):
+        self.vars = {} if vars is None else vars
+        self.parent = parent
+
+    def __getitem__(self, key):
+        scope = self
+        while scope is not None:
+            value = scope.vars.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            scope = scope.parent
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        scope = self
+        while scope is not None:
+            value = scope.vars.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            scope = scope.parent
+        return default
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        self.vars[key] = value
+
+    def __iter__(self):
+        seen = set()
+        scope = self
+        while scope is not None:
+            for key in scope.vars:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+            scope = scope.parent
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        depth = 0
+        scope = self
+        while scope is not None:
+            depth += 1
+            scope = scope.parent
+        return f"<Scope {len(self.vars)} vars, {depth} layers>"
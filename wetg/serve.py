@@ -0,0 +1,202 @@
+"""
+WETG v7 "Super Weox" — Multi-bot hosting
+
+`wetg serve bots/*.wetg` runs many scripts in one process instead of one
+process (and one copy of python-telegram-bot) per bot. The bots share:
+
+    the event loop
+    one HTTP connection pool for Bot API calls (and one for getUpdates)
+    the photo file_id cache (entries are keyed by bot id)
+    one metrics registry (series are labelled with the bot name)
+    in webhook mode, one HTTP server: each bot gets <path>/<name>
+
+Everything a script can see stays per bot: its variables, user./chat. state
+(one SQLite file per bot with --state-dir), asks, scheduler and send queue.
+"""
+
+import asyncio
+import os
+import secrets
+
+from telegram.request import HTTPXRequest
+
+from .httpserver import HTTPServer
+from .interpreter import Wetg
+from .media import MediaCache
+from .metrics import Metrics
+from .state import SQLiteStore
+
+
+class SharedRequest(HTTPXRequest):
+    """An HTTPXRequest used by several bots: only the last shutdown() closes the pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._users = 0
+
+    async def initialize(self):
+        self._users += 1
+        if self._users == 1:
+            await super().initialize()
+
+    async def shutdown(self):
+        self._users -= 1
+        if self._users == 0:
+            await super().shutdown()
+
+    async def close(self):
+        """Close the pool even if a bot that failed to start never released it."""
+        self._users = 0
+        await super().shutdown()
+
+
+class BotHost:
+    """
+    Hosts several Wetg bots on one event loop.
+
+    Example:
+        host = BotHost(["shop.wetg", "faq.wetg"], state_dir="state")
+        host.load()
+        asyncio.run(host.run())
+    """
+
+    def __init__(
+        self,
+        files,
+        state_dir: str = None,
+        media: MediaCache = None,
+        metrics: Metrics = None,
+        concurrency: int = 16,
+        pool_size: int = None,
+        limits=None,
+    ):
+        self.files = list(files)
+        self.state_dir = state_dir
+        self.media = media if media is not None else MediaCache()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.limits = limits
+        self.bots = {}   # name → Wetg
+        self.server = None
+        self.metrics_server = None
+        self.requests = ()
+
+    def _name(self, path):
+        base = os.path.splitext(os.path.basename(path))[0]
+        name, n = base, 2
+        while name in self.bots:
+            name = f"{base}-{n}"
+            n += 1
+        return name
+
+    def load(self):
+        """Parse every script; scripts without a token or with a duplicate one are skipped."""
+        tokens = {}
+        for path in self.files:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    code = f.read()
+            except OSError as e:
+                print(f"⚠️  Skipping {path}: {e}")
+                continue
+            name = self._name(path)
+            store = None
+            if self.state_dir:
+                os.makedirs(self.state_dir, exist_ok=True)
+                store = SQLiteStore(os.path.join(self.state_dir, name + ".db"))
+            bot = Wetg(
+                code,
+                store=store,
+                concurrency=self.concurrency,
+                media=self.media,
+                name=name,
+                limits=self.limits,
+            )
+            bot.parse()
+            if not bot.token:
+                print(f"⚠️  Skipping {path}: no bot token in the script")
+                continue
+            if bot.token in tokens:
+                print(f"⚠️  Skipping {path}: same token as {tokens[bot.token]}")
+                continue
+            tokens[bot.token] = path
+            bot.metrics = self.metrics
+            self.metrics.watch(bot)
+            self.bots[name] = bot
+        return self.bots
+
+    async def start(
+        self,
+        mode: str = "polling",
+        listen: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/hook",
+        url: str = None,
+        secret_token: str = None,
+        ssl=None,
+        metrics_port: int = None,
+    ):
+        """Start every loaded bot. In webhook mode bot `name` is served on <path>/<name>."""
+        if not self.bots:
+            raise RuntimeError("No bots to serve.")
+        count = len(self.bots)
+        request = SharedRequest(connection_pool_size=self.pool_size or max(8, 2 * count))
+        updates_request = SharedRequest(connection_pool_size=count + 1)
+        self.requests = (request, updates_request)
+
+        if mode == "webhook":
+            self.server = HTTPServer(listen, port, ssl=ssl)
+        if metrics_port is not None:
+            if self.server is not None and metrics_port == port:
+                self.server.route("GET", "/metrics", self.metrics.handle)
+            else:
+                self.metrics_server = HTTPServer(listen, metrics_port)
+                self.metrics_server.route("GET", "/metrics", self.metrics.handle)
+
+        base = path.rstrip("/")
+        failed = []
+        for name, bot in self.bots.items():
+            print(f"🤖 Starting {name}")
+            options = {"mode": mode, "request": request, "get_updates_request": updates_request}
+            if mode == "webhook":
+                options.update(
+                    path=f"{base}/{name}",
+                    url=f"{url.rstrip('/')}/{name}" if url else None,
+                    secret_token=secret_token or (secrets.token_urlsafe(32) if url else None),
+                    server=self.server,
+                )
+            try:
+                await bot.start(**options)
+            except Exception as e:
+                print(f"⚠️  {name} failed to start: {e}")
+                failed.append(name)
+        for name in failed:
+            # release what the bot did start, then leave the others running
+            await asyncio.gather(self.bots.pop(name).stop(), return_exceptions=True)
+            self.metrics.unwatch(name)
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+            print(f"📊 Metrics on http://{listen}:{self.metrics_server.port}/metrics")
+
+    async def stop(self):
+        # SharedRequest keeps the pools open until the last bot has shut down
+        await asyncio.gather(*(bot.stop() for bot in self.bots.values()), return_exceptions=True)
+        for request in self.requests:
+            await request.close()
+        if self.server is not None:
+            await self.server.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+
+    async def run(self, **options):
+        """Start all bots and run until Ctrl+C."""
+        await self.start(**options)
+        print(f"🚀 Serving {len(self.bots)} bots... Press Ctrl+C to stop.")
+        try:
+            await asyncio.Event().wait()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            print("\n🛑 Shutting down...")
+            await self.stop()
@@ -0,0 +1,207 @@
+"""
+WETG v7 "Super Weox" — Multi-process sharding
+
+One interpreter runs on one event loop, so a busy bot tops out at one CPU
+core. `wetg run mybot.wetg --workers 4` splits the work:
+
+    ingest process    receives updates (polling or webhook) and forwards each
+                      one to worker  chat_id % N
+    N worker processes run the script and talk to the Bot API themselves
+
+All updates of a chat land on the same worker, so per-chat ordering and
+pending asks work exactly as with one process. user./chat. variables live in
+one SQLite database opened with shared=True, so a user who writes to the bot
+from several chats (and therefore several workers) sees consistent data.
+The global flood limit is divided between the workers; per-chat limits need
+no coordination because a chat never leaves its worker.
+
+Runtime `set` of plain global variables stays local to each worker.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+
+from .interpreter import Wetg
+from .media import MediaCache
+from .outbox import Outbox
+from .state import SQLiteStore
+
+
+def shard_of(chat_id, workers: int) -> int:
+    """Worker index for a chat: stable across restarts (no hash randomisation)."""
+    return (chat_id or 0) % workers
+
+
+class WorkerContext:
+    """The callback context handed to process_update() in a worker: just the bot."""
+
+    __slots__ = ("bot",)
+
+    def __init__(self, bot):
+        self.bot = bot
+
+
+# ------------------ WORKER ------------------
+
+def worker_main(index, workers, code, token, inbox, options):
+    """Entry point of a worker process."""
+    # Ctrl+C reaches the whole process group: let the ingest process decide
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_worker(index, workers, code, token, inbox, options))
+    except Exception as e:
+        print(f"⚠️  Worker {index} crashed: {e}")
+        raise
+
+
+async def _worker(index, workers, code, token, inbox, options):
+    from telegram import Bot, Update
+
+    store = SQLiteStore(options["state"], shared=True) if options.get("state") else None
+    media = options.get("media_cache")
+    if media:
+        base, ext = os.path.splitext(media)
+        media = f"{base}.{index}{ext}"
+    bot = Wetg(
+        code,
+        store=store,
+        concurrency=options.get("concurrency", 16),
+        outbox=Outbox(global_rate=30 / workers, global_burst=max(1, 5 // workers)),
+        media=MediaCache(media),
+        name=f"{options.get('name', 'bot')}-{index}",
+        limits=options.get("limits"),
+    )
+    bot.parse(cache=options.get("cache"))
+    bot.token = token
+
+    tg = Bot(token)
+    await tg.initialize()
+    context = WorkerContext(tg)
+    if bot.media_paths:
+        await bot.assets.preload(bot.media_paths)
+    await bot.store.start()
+    bot.asking.start()
+    bot.scheduler.start()
+    bot.outbox.start()
+
+    try:
+        while True:
+            data = await asyncio.to_thread(inbox.get)
+            if data is None:
+                break
+            update = Update.de_json(data, tg)
+            chat = update.effective_chat
+            await bot.scheduler.put(
+                chat.id if chat else 0,
+                lambda update=update: bot.process_update(update, context),
+            )
+    finally:
+        await bot.scheduler.stop()
+        await bot.outbox.stop()
+        await bot.asking.stop()
+        await bot.store.close()
+        await tg.shutdown()
+
+
+# ------------------ INGEST ------------------
+
+class ShardedWetg(Wetg):
+    """
+    A Wetg that receives updates but hands them to `workers` processes.
+
+    Example:
+        bot = ShardedWetg(code, workers=4, state="mybot.db")
+        bot.parse()
+        asyncio.run(bot.run())
+    """
+
+    def __init__(
+        self,
+        code: str,
+        workers: int = 2,
+        state: str = None,
+        media_cache: str = None,
+        concurrency: int = 16,
+        queue_size: int = 10_000,
+        **options,
+    ):
+        super().__init__(code, **options)
+        self.source = code
+        self.workers = max(1, workers)
+        self.worker_options = {
+            "state": state,
+            "media_cache": media_cache,
+            "concurrency": concurrency,
+            "name": self.name,
+            "limits": self.limits if self.limits is not None else False,
+        }
+        self.queue_size = queue_size
+        self._mp = multiprocessing.get_context("spawn")
+        self.inboxes = []
+        self.processes = []
+        self._watchdog = None
+        self.forwarded = 0
+
+    def parse(self, cache: str = None):
+        # the workers parse the same script: let them use the same cache
+        self.worker_options["cache"] = cache
+        super().parse(cache)
+
+    def _spawn(self, index):
+        process = self._mp.Process(
+            target=worker_main,
+            args=(index, self.workers, self.source, self.token, self.inboxes[index], self.worker_options),
+            name=f"wetg-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    async def _watch(self, interval=5):
+        """Restart workers that died; their queued updates are still in the inbox."""
+        while True:
+            await asyncio.sleep(interval)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    print(f"⚠️  Worker {index} exited ({process.exitcode}), restarting")
+                    self.processes[index] = self._spawn(index)
+
+    async def _on_update(self, update, context):
+        """Forward the update to the worker that owns its chat."""
+        chat = update.effective_chat
+        inbox = self.inboxes[shard_of(chat.id if chat else 0, self.workers)]
+        data = update.to_dict()
+        while True:
+            try:
+                inbox.put_nowait(data)
+                break
+            except queue.Full:
+                # worker is behind: push back on the update source
+                await asyncio.sleep(0.01)
+        self.forwarded += 1
+
+    async def start(self, **options):
+        self.media_paths = []   # the workers send the photos, not the ingest process
+        self.load_token()
+        if self.token:
+            self.inboxes = [self._mp.Queue(self.queue_size) for _ in range(self.workers)]
+            self.processes = [self._spawn(i) for i in range(self.workers)]
+            self._watchdog = asyncio.create_task(self._watch())
+            print(f"🧩 Started {self.workers} worker processes")
+        await super().start(**options)
+
+    async def stop(self, timeout: float = 10):
+        await super().stop()
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        for inbox in self.inboxes:
+            inbox.put(None)
+        for process in self.processes:
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
@@ -0,0 +1,322 @@
+"""
+WETG v7 "Super Weox" — Per-user / per-chat state
+
+`set user.x=…` and `set chat.x=…` write into namespaces kept by a StateStore.
+MemoryStore keeps everything in dicts; SQLiteStore adds write-behind
+persistence: writes only mark a namespace dirty and a background task
+flushes dirty namespaces to disk in one transaction.
+
+Stores also keep the set of known users (everyone who wrote to the bot in a
+private chat) for `broadcast`: users() pages through it in id order, and
+mark_user() takes users who blocked the bot or deleted their account out of
+it until they write again.
+
+SQLiteStore(shared=True) is for several processes on one database (see
+wetg.shard): namespaces are re-read for every update and each changed
+variable is written through at once, so processes never overwrite each
+other's variables with stale copies.
+
+The interpreter uses the async load() / write(), which keep SQLite reads and
+write-through off the event loop; namespace() / save() are their blocking
+counterparts.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+from bisect import bisect_right
+
+
+class StateStore:
+    """Interface for state backends used by Wetg."""
+
+    def namespace(self, kind: str, key) -> dict:
+        """Return the live variable dict for ("user" | "chat", id)."""
+        raise NotImplementedError
+
+    def save(self, kind: str, key, ns: dict = None):
+        """Called after `ns`, a namespace returned by namespace(), was modified."""
+
+    async def load(self, kind: str, key) -> dict:
+        """namespace() without blocking the event loop."""
+        return self.namespace(kind, key)
+
+    async def write(self, kind: str, key, ns: dict = None):
+        """save() without blocking the event loop."""
+        self.save(kind, key, ns)
+
+    def remember_user(self, user_id: int):
+        """Called for every update from a user in their private chat."""
+
+    def users(self, after: int = None, limit: int = 1000) -> list:
+        """Up to `limit` reachable known user ids greater than `after`, ascending."""
+        return []
+
+    def mark_user(self, user_id: int, status: str):
+        """Leave `user_id` out of users() (e.g. "blocked") until they write again."""
+
+    async def load_users(self, after: int = None, limit: int = 1000) -> list:
+        """users() without blocking the event loop."""
+        return self.users(after, limit)
+
+    async def write_user_status(self, user_id: int, status: str):
+        """mark_user() without blocking the event loop."""
+        self.mark_user(user_id, status)
+
+    async def start(self):
+        """Start background work (called from Wetg.run)."""
+
+    async def close(self):
+        """Flush pending writes and release resources."""
+
+
+class MemoryStore(StateStore):
+    """In-process dict store. State is lost on restart."""
+
+    def __init__(self):
+        self._data = {}
+        self._users = {}        # user id → None (reachable) or a status
+        self._user_order = None  # sorted ids, rebuilt after new users
+
+    def namespace(self, kind, key):
+        ns = self._data.get((kind, key))
+        if ns is None:
+            ns = self._data[(kind, key)] = {}
+        return ns
+
+    def remember_user(self, user_id):
+        if self._users.get(user_id, "") is not None:
+            if user_id not in self._users:
+                self._user_order = None
+            self._users[user_id] = None
+
+    def users(self, after=None, limit=1000):
+        if self._user_order is None:
+            self._user_order = sorted(self._users)
+        order = self._user_order
+        i = 0 if after is None else bisect_right(order, after)
+        page = []
+        while i < len(order) and len(page) < limit:
+            if self._users[order[i]] is None:
+                page.append(order[i])
+            i += 1
+        return page
+
+    def mark_user(self, user_id, status):
+        if user_id in self._users:
+            self._users[user_id] = status
+
+
+class _Tracked(dict):
+    """A namespace dict that remembers which variables were assigned."""
+
+    __slots__ = ("changed",)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.changed = set()
+
+    def __setitem__(self, name, value):
+        super().__setitem__(name, value)
+        self.changed.add(name)
+
+
+class SQLiteStore(MemoryStore):
+    """
+    Write-behind SQLite store.
+
+    Namespaces are loaded on first use and cached; save() only records the
+    namespace as dirty. Dirty namespaces are written every `flush_interval`
+    seconds from a worker thread, and once more on close(). With
+    shared=True nothing is cached and changes are written through instead.
+
+    Example:
+        bot = Wetg(code, store=SQLiteStore("mybot.db"))
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, shared: bool = False):
+        super().__init__()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self._dirty = set()
+        self._new_users = set()  # users who wrote since the last flush
+        self._lock = threading.Lock()
+        self._task = None
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                " kind TEXT NOT NULL, key TEXT NOT NULL, name TEXT NOT NULL, value TEXT,"
+                " PRIMARY KEY (kind, key, name))"
+            )
+            exists = self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'"
+            ).fetchone()
+            if not exists:
+                self._db.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, status TEXT)")
+                # databases from before user tracking: everyone with user. state
+                self._db.execute(
+                    "INSERT OR IGNORE INTO users (id) "
+                    "SELECT DISTINCT CAST(key AS INTEGER) FROM state WHERE kind = 'user'"
+                )
+
+    def _read(self, kind, key):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, value FROM state WHERE kind = ? AND key = ?",
+                (kind, str(key)),
+            ).fetchall()
+        return {name: json.loads(value) for name, value in rows}
+
+    def namespace(self, kind, key):
+        ns = None if self.shared else self._data.get((kind, key))
+        if ns is None:
+            values = self._read(kind, key)
+            if self.shared:
+                return _Tracked(values)
+            ns = self._data[(kind, key)] = values
+        return ns
+
+    async def load(self, kind, key):
+        if not self.shared:
+            ns = self._data.get((kind, key))
+            if ns is not None:
+                return ns
+        values = await asyncio.to_thread(self._read, kind, key)
+        if self.shared:
+            return _Tracked(values)
+        # another update may have loaded it while this one was reading
+        return self._data.setdefault((kind, key), values)
+
+    def _take_changes(self, ns):
+        """(name, json value) of the variables assigned in a shared namespace."""
+        changes = [(name, json.dumps(ns[name])) for name in ns.changed]
+        ns.changed.clear()
+        return changes
+
+    def _write_through(self, kind, key, changes):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO state (kind, key, name, value) VALUES (?, ?, ?, ?)",
+                [(kind, str(key), name, value) for name, value in changes],
+            )
+
+    def save(self, kind, key, ns=None):
+        if not self.shared:
+            self._dirty.add((kind, key))
+            return
+        if getattr(ns, "changed", None):
+            self._write_through(kind, key, self._take_changes(ns))
+
+    async def write(self, kind, key, ns=None):
+        if not self.shared:
+            self._dirty.add((kind, key))
+            return
+        if getattr(ns, "changed", None):
+            await asyncio.to_thread(self._write_through, kind, key, self._take_changes(ns))
+
+    def remember_user(self, user_id):
+        # written by the flusher, in shared mode too: other processes only
+        # need the user list for broadcasts. Every flush re-registers everyone
+        # seen since the last one, so a user marked by another process (e.g.
+        # `wetg broadcast`) becomes reachable again as soon as they write.
+        self._new_users.add(user_id)
+
+    def _read_users(self, pending, after, limit):
+        if pending:
+            self._write([], pending)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM users WHERE status IS NULL AND id > ? ORDER BY id LIMIT ?",
+                (-(1 << 63) if after is None else after, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def _write_status(self, user_id, status):
+        with self._lock, self._db:
+            self._db.execute("UPDATE users SET status = ? WHERE id = ?", (status, user_id))
+
+    def users(self, after=None, limit=1000):
+        return self._read_users(self._take_users(), after, limit)
+
+    async def load_users(self, after=None, limit=1000):
+        pending = self._take_users()
+        try:
+            return await asyncio.to_thread(self._read_users, pending, after, limit)
+        except BaseException:
+            self._new_users |= pending
+            raise
+
+    def mark_user(self, user_id, status):
+        self._new_users.discard(user_id)
+        self._write_status(user_id, status)
+
+    async def write_user_status(self, user_id, status):
+        self._new_users.discard(user_id)
+        await asyncio.to_thread(self._write_status, user_id, status)
+
+    def _take_dirty(self):
+        """Snapshot dirty namespaces on the event loop thread."""
+        dirty, self._dirty = self._dirty, set()
+        # a save() for a namespace this store never handed out has nothing to write
+        return [(kind, key, dict(self._data[(kind, key)])) for kind, key in dirty if (kind, key) in self._data]
+
+    def _take_users(self):
+        users, self._new_users = self._new_users, set()
+        return users
+
+    def _write(self, batch, users=()):
+        with self._lock, self._db:
+            if users:
+                # writing to the bot again makes a blocked user reachable again
+                self._db.executemany(
+                    "INSERT INTO users (id) VALUES (?) "
+                    "ON CONFLICT (id) DO UPDATE SET status = NULL WHERE status IS NOT NULL",
+                    [(user_id,) for user_id in users],
+                )
+            for kind, key, values in batch:
+                key = str(key)
+                self._db.execute("DELETE FROM state WHERE kind = ? AND key = ?", (kind, key))
+                self._db.executemany(
+                    "INSERT INTO state (kind, key, name, value) VALUES (?, ?, ?, ?)",
+                    [(kind, key, name, json.dumps(value)) for name, value in values.items()],
+                )
+
+    def flush(self):
+        """Write all dirty namespaces now (blocking)."""
+        batch = self._take_dirty()
+        users = self._take_users()
+        if batch or users:
+            self._write(batch, users)
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            batch = self._take_dirty()
+            users = self._take_users()
+            if batch or users:
+                try:
+                    await asyncio.to_thread(self._write, batch, users)
+                except Exception as e:
+                    print(f"⚠️  State flush failed: {e}")
+                    for kind, key, _ in batch:
+                        self._dirty.add((kind, key))
+                    self._new_users |= users
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flusher())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+        self._db.close()
@@ -0,0 +1,84 @@
+"""
+WETG v7 "Super Weox" — Hot reload
+
+`wetg run mybot.wetg --watch` keeps the bot running while you edit it:
+
+    the script's modification time is polled (twice a second by default)
+    on a change the file is re-parsed with Wetg.reload(); only the `on` /
+    `function` blocks whose text changed are compiled again
+    the new handler tables replace the old ones in one step
+
+The Telegram connection, queued updates, pending asks and all variables
+survive a reload. A script that fails to load leaves the running version in
+place.
+"""
+
+import asyncio
+import os
+import time
+
+
+class ScriptWatcher:
+    """
+    Reloads `bot` from `path` whenever the file changes.
+
+    Example:
+        watcher = ScriptWatcher(bot, "mybot.wetg")
+        watcher.start()
+        ...
+        await watcher.stop()
+    """
+
+    def __init__(self, bot, path: str, interval: float = 0.5):
+        self.bot = bot
+        self.path = path
+        self.interval = interval
+        self.reloads = 0
+        self._mtime = self._stat()
+        self._task = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    async def check(self) -> bool:
+        """Reload if the file changed since the last check; True if it did."""
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        start = time.perf_counter()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                code = f.read()
+            known = set(self.bot.media_paths)
+            compiled = self.bot.reload(code)
+        except Exception as e:
+            print(f"⚠️  Reload of {self.path} failed, keeping the running version: {e}")
+            return False
+        elapsed = (time.perf_counter() - start) * 1000
+        self.reloads += 1
+        print(f"♻️  Reloaded {self.path} in {elapsed:.1f} ms ({compiled} blocks compiled)")
+
+        new_media = [p for p in self.bot.media_paths if p not in known]
+        if new_media:
+            await self.bot.assets.preload(new_media)
+        return True
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,122 @@
+"""
+WETG v7 "Super Weox" — Webhook receiver
+
+Telegram POSTs each update as JSON to our URL. WebhookServer checks the
+X-Telegram-Bot-Api-Secret-Token header, puts the decoded update on a bounded
+queue and answers immediately; a consumer task hands updates to the bot.
+When the queue is full the server answers 503 and Telegram retries later.
+
+It only needs a handler coroutine, so it can be fed locally:
+
+    curl -X POST localhost:8443/hook -H 'X-Telegram-Bot-Api-Secret-Token: s3cret' \\
+         -d @update.json
+"""
+
+import asyncio
+import hmac
+import json
+
+from .httpserver import HTTPServer, Response
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+class WebhookServer:
+    """
+    Receive Telegram updates over HTTP and pass each update dict to `handler`.
+
+    Example:
+        async def handler(data):
+            print(data["update_id"])
+
+        server = WebhookServer(handler, port=8443, path="/hook", secret_token="s3cret")
+        await server.start()
+    """
+
+    def __init__(
+        self,
+        handler,
+        listen: str = "0.0.0.0",
+        port: int = 8443,
+        path: str = "/hook",
+        secret_token: str = None,
+        queue_size: int = 1000,
+        ssl=None,
+        server: HTTPServer = None,
+    ):
+        self.handler = handler
+        self.path = path if path.startswith("/") else "/" + path
+        self.secret_token = secret_token
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.own_server = server is None
+        self.server = server or HTTPServer(listen, port, ssl=ssl)
+        self.server.route("POST", self.path, self._receive)
+        self._consumer = None
+        self.received = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    async def _receive(self, request):
+        if self.secret_token is not None:
+            given = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(given.encode(), self.secret_token.encode()):
+                self.rejected += 1
+                return Response(403, "bad secret token")
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            self.rejected += 1
+            return Response(400, "invalid json")
+        if not isinstance(data, dict):
+            self.rejected += 1
+            return Response(400, "update must be an object")
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return Response(503, "busy")
+        self.received += 1
+        return Response(200, "ok")
+
+    async def _consume(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                await self.handler(data)
+            except Exception as e:
+                print(f"⚠️  Update {data.get('update_id')} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+    async def start(self):
+        await self.server.start()
+        self._consumer = asyncio.create_task(self._consume())
+
+    async def stop(self, drain_timeout: float = 10):
+        """Stop accepting updates, give queued ones `drain_timeout` seconds, then stop.
+
+        A server passed in by the caller keeps running for its other routes.
+        """
+        if self.own_server:
+            await self.server.stop()
+        else:
+            self.server.routes.pop(("POST", self.path), None)
+        if self._consumer is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._consumer.cancel()
+            try:
+                await self._consumer
+            except asyncio.CancelledError:
+                pass
+            self._consumer = None